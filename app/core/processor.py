@@ -19,6 +19,12 @@ except ImportError:
     sys.path.append(str(root_dir))
     from app.util.merge_database import MergeDatabase
 
+try:
+    from pyJianYingDraft.media_probe import Probe_cache, probe_file, get_probe_cache, set_probe_cache
+except ImportError:
+    # pyJianYingDraft 不可用时回退到 ffprobe
+    probe_file = None
+
 logger = logging.getLogger(__name__)
 
 # --- Configuration Constants (Consider making these configurable later) ---
@@ -31,6 +37,7 @@ GPU_TYPE = 'nvidia' # 'nvidia', 'intel', 'amd' (Only relevant if USE_GPU_ACCEL i
 # 添加数据库路径常量
 DB_DIR = "db"  # 数据库文件存放目录
 DB_FILE = "merge_history.db"  # 数据库文件名
+PROBE_CACHE_FILE = "probe_cache.db"  # 媒体探测缓存文件名
 
 def find_video_tasks(input_folder):
     """
@@ -97,13 +104,42 @@ def find_video_tasks(input_folder):
 
 # --- FFmpeg Helper Functions ---
 
+def _ensure_probe_cache():
+    """启用持久化的媒体探测缓存（若尚未启用），剪映素材对象构造时也会共用该缓存"""
+    if get_probe_cache() is not None:
+        return
+    try:
+        set_probe_cache(Probe_cache(os.path.join(DB_DIR, PROBE_CACHE_FILE)))
+    except Exception as e:
+        logger.warning(f"无法启用媒体探测缓存，将仅使用进程内缓存: {e}")
+
 def get_video_duration(video_path):
-    """使用 ffprobe 获取视频时长 (秒)"""
+    """获取视频时长 (秒)
+
+    优先使用 pyJianYingDraft 的统一探测服务，同一文件在一次运行中只会被解析一次，
+    并与剪映素材对象共用探测结果；服务不可用或探测失败时回退到 ffprobe。
+    """
     # Ensure video_path exists before calling ffprobe
     if not os.path.exists(video_path):
         logger.error(f"get_video_duration: 视频文件不存在: {video_path}")
         return None # Return None instead of raising an error here
 
+    if probe_file is not None:
+        _ensure_probe_cache()
+        try:
+            info = probe_file(video_path)
+            if info.duration is not None:
+                duration = info.duration / 1e6
+                logger.debug(f"获取 '{os.path.basename(video_path)}' 时长: {duration:.2f} 秒")
+                return duration
+            logger.warning(f"探测服务未能获取 '{os.path.basename(video_path)}' 的时长，尝试使用 ffprobe")
+        except Exception as e:
+            logger.warning(f"探测服务获取视频时长失败，尝试使用 ffprobe: {e}")
+
+    return _ffprobe_duration(video_path)
+
+def _ffprobe_duration(video_path):
+    """使用 ffprobe 获取视频时长 (秒)"""
     command = [
         'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', video_path
     ]
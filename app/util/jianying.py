@@ -315,23 +315,26 @@ def process_videos(video_paths,
         try:
             # 记录原始检查逻辑
             has_errors = False
-            for video_path in video_paths:
-                if not os.path.exists(video_path):
+            # 并发探测所有素材文件, 结果与video_paths一一对应
+            materials, mat_errors = draft.Video_material.from_paths(video_paths)
+            for i, video_path in enumerate(video_paths):
+                mat_err = mat_errors.get(i)
+                if isinstance(mat_err, FileNotFoundError):
                     logger.error(f"用于替换的视频文件不存在: {video_path}")
                     has_errors = True
                     continue
-                logger.debug(f"  创建素材对象: {os.path.basename(video_path)}")
-                try:
-                    material = draft.Video_material(video_path)
-                    # 添加name属性，使用文件名
-                    material.name = os.path.basename(video_path)
-                    # 手动重写一些常用的访问器
-                    if not hasattr(material, 'filename'):
-                        material.filename = os.path.basename(video_path)
-                    video_materials.append(material)
-                except Exception as mat_err:
+                if mat_err is not None:
                     logger.error(f"创建视频素材对象时出错 ({video_path}): {mat_err}")
                     has_errors = True
+                    continue
+                logger.debug(f"  创建素材对象: {os.path.basename(video_path)}")
+                material = materials[i]
+                # 添加name属性，使用文件名
+                material.name = os.path.basename(video_path)
+                # 手动重写一些常用的访问器
+                if not hasattr(material, 'filename'):
+                    material.filename = os.path.basename(video_path)
+                video_materials.append(material)
             
             if has_errors and not video_materials:
                 raise FileNotFoundError(f"预期存在的视频片段未找到")
@@ -409,44 +412,83 @@ def process_videos(video_paths,
         logger.info(f"开始替换模板中的片段")
         replaced_segments = []
         error_list = []
-        for i in range(segments_to_iterate):
-            try:
-                segment_index = i
-                # 修复Bug 1: 使用模运算来循环重用素材
-                material_index = i % len(video_materials)
-                material = video_materials[material_index]
-                material_name = getattr(material, 'name', os.path.basename(getattr(material, 'original_path', f"material_{material_index}")))
-                logger.info(f"替换 模板片段索引 {segment_index} 使用素材: {material_name}")
-                
-                # 使用视频替换指定索引的片段
-                script.replace_material_by_seg(
-                    video_track,
-                    segment_index,
-                    material,
-                    handle_shrink=Shrink_mode.cut_tail_align, # 片段缩短时，切尾并前移后续片段
-                    handle_extend=Extend_mode.push_tail # 片段延长时，推后结束点及后续片段
-                )
-                
+        # 优先一次性替换整条轨道; 批量替换在中途失败(如某片段延长失败)时可能已替换了部分片段,
+        # 故先保存轨道的副本, 失败时恢复原状, 再退回逐个替换以跳过出错的片段
+        materials_to_use = [video_materials[i % len(video_materials)] for i in range(segments_to_iterate)]
+
+        def get_material_name(material, material_index):
+            default_name = f"material_{material_index}"
+            return getattr(material, 'name', os.path.basename(getattr(material, 'original_path', default_name)))
+
+        track_backup = video_track.fork()
+        try:
+            script.replace_materials_on_track(
+                video_track,
+                materials_to_use,
+                handle_shrink=Shrink_mode.cut_tail_align,  # 片段缩短时，切尾并前移后续片段
+                handle_extend=Extend_mode.push_tail  # 片段延长时，推后结束点及后续片段
+            )
+        except Exception as e:
+            logger.warning(f"批量替换片段失败: {str(e)}，恢复轨道后改为逐个替换")
+            video_track.segments = track_backup.segments
+            for i in range(segments_to_iterate):
+                try:
+                    segment_index = i
+                    # 修复Bug 1: 使用模运算来循环重用素材
+                    material_index = i % len(video_materials)
+                    material = video_materials[material_index]
+                    material_name = get_material_name(material, material_index)
+                    logger.info(f"替换 模板片段索引 {segment_index} 使用素材: {material_name}")
+
+                    # 使用视频替换指定索引的片段
+                    script.replace_material_by_seg(
+                        video_track,
+                        segment_index,
+                        material,
+                        handle_shrink=Shrink_mode.cut_tail_align,  # 片段缩短时，切尾并前移后续片段
+                        handle_extend=Extend_mode.push_tail  # 片段延长时，推后结束点及后续片段
+                    )
+
+                    # 设置片段音量
+                    if normalized_main_volume != 1.0 and i < len(video_track):
+                        set_segment_volume(
+                            video_track.get_segment(i),
+                            normalized_main_volume,
+                            segment_idx=i,
+                            context="替换后立即设置"
+                        )
+
+                    # 记录替换结果
+                    replaced_segments.append({
+                        "index": segment_index,
+                        "material_path": getattr(material, 'original_path', "unknown"),
+                        "material_name": material_name
+                    })
+                    logger.info(f"成功替换片段 {segment_index}")
+                except Exception as e:
+                    logger.error(f"替换片段 {i} 时出错: {str(e)}")
+                    error_list.append(f"片段{i}替换失败: {str(e)}")
+                    continue
+        else:
+            for i, material in enumerate(materials_to_use):
+                material_name = get_material_name(material, i % len(video_materials))
+                logger.info(f"替换 模板片段索引 {i} 使用素材: {material_name}")
+
                 # 设置片段音量
-                if normalized_main_volume != 1.0 and i < len(video_track.segments):
+                if normalized_main_volume != 1.0:
                     set_segment_volume(
-                        video_track.segments[i], 
-                        normalized_main_volume, 
-                        segment_idx=i, 
+                        video_track.get_segment(i),
+                        normalized_main_volume,
+                        segment_idx=i,
                         context="替换后立即设置"
                     )
-                
-                # 记录替换结果
                 replaced_segments.append({
-                    "index": segment_index,
+                    "index": i,
                     "material_path": getattr(material, 'original_path', "unknown"),
                     "material_name": material_name
                 })
-                logger.info(f"成功替换片段 {segment_index}")
-            except Exception as e:
-                logger.error(f"替换片段 {i} 时出错: {str(e)}")
-                error_list.append(f"片段{i}替换失败: {str(e)}")
-                continue
+                logger.info(f"成功替换片段 {i}")
+            logger.info(f"成功批量替换 {len(replaced_segments)} 个片段")
 
         replace_time = time.time() - replace_start_time
         logger.info(f"视频片段替换完成，耗时: {replace_time:.2f}秒.")
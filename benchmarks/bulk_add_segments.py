@@ -0,0 +1,36 @@
+"""比较逐个调用`add_segment`与批量调用`add_segments`生成长文本轨道的耗时"""
+
+import time
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import Timerange
+
+SEGMENT_COUNT = 20000
+SEGMENT_DURATION = 100000
+
+def make_segments():
+    return [draft.Text_segment("字幕%d" % i, Timerange(i * SEGMENT_DURATION, SEGMENT_DURATION)) for i in range(SEGMENT_COUNT)]
+
+def build(bulk: bool) -> float:
+    """返回向空草稿中添加片段的耗时(秒), 不含片段对象的构造"""
+    script = draft.Script_file(1920, 1080).add_track(draft.Track_type.text)
+    segments = make_segments()
+
+    start = time.perf_counter()
+    if bulk:
+        script.add_segments(segments)
+    else:
+        for segment in segments:
+            script.add_segment(segment)
+    return time.perf_counter() - start
+
+def main() -> None:
+    single_time = build(False)
+    bulk_time = build(True)
+
+    print("文本片段数: %d" % SEGMENT_COUNT)
+    print("add_segment:  %8.2f ms" % (single_time * 1e3))
+    print("add_segments: %8.2f ms (%.1fx)" % (bulk_time * 1e3, single_time / bulk_time))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""基准测试的公共辅助函数"""
+
+import os
+import json
+import time
+import uuid
+from copy import deepcopy
+
+from typing import Callable, Dict, Any
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import trange
+
+TUTORIAL_ASSET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "readme_assets", "tutorial")
+
+def make_large_draft(folder: str, draft_name: str, segment_count: int) -> str:
+    """在`folder`下生成一个包含`segment_count`个视频片段及同样数量文本片段的草稿, 返回其`draft_content.json`的路径
+
+    先用常规接口生成各一个片段, 再在JSON层面复制, 以免生成过程本身耗时过长
+    """
+    script = draft.Script_file(1920, 1080)
+    script.add_track(draft.Track_type.video).add_track(draft.Track_type.text)
+    video_material = draft.Video_material(os.path.join(TUTORIAL_ASSET_DIR, "video.mp4"))
+    script.add_segment(draft.Video_segment(video_material, trange(0, "0.1s")))
+    script.add_segment(draft.Text_segment("文本", trange(0, "0.1s")))
+    content: Dict[str, Any] = json.loads(script.dumps())
+
+    video_track, text_track = content["tracks"][0], content["tracks"][1]
+    video_seg_template, text_seg_template = video_track["segments"][0], text_track["segments"][0]
+    speed_template, text_template = content["materials"]["speeds"][0], content["materials"]["texts"][0]
+    video_track["segments"], text_track["segments"] = [], []
+    content["materials"]["speeds"], content["materials"]["texts"] = [], []
+
+    duration = video_seg_template["target_timerange"]["duration"]
+    for i in range(segment_count):
+        speed = dict(speed_template, id=uuid.uuid4().hex)
+        video_seg = deepcopy(video_seg_template)
+        video_seg.update(id=uuid.uuid4().hex, extra_material_refs=[speed["id"]])
+        video_seg["target_timerange"]["start"] = i * duration
+        video_track["segments"].append(video_seg)
+        content["materials"]["speeds"].append(speed)
+
+        text = dict(text_template, id=uuid.uuid4().hex)
+        text_seg = deepcopy(text_seg_template)
+        text_seg.update(id=uuid.uuid4().hex, material_id=text["id"])
+        text_seg["target_timerange"]["start"] = i * duration
+        text_track["segments"].append(text_seg)
+        content["materials"]["texts"].append(text)
+    content["duration"] = segment_count * duration
+
+    draft_path = os.path.join(folder, draft_name)
+    os.makedirs(draft_path, exist_ok=True)
+    json_path = os.path.join(draft_path, "draft_content.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(content, f, ensure_ascii=False, indent=4)
+    return json_path
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    """重复执行`func`, 返回平均耗时(秒)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
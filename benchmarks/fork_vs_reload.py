@@ -0,0 +1,27 @@
+"""比较`Script_file.fork()`与重新加载模板的耗时"""
+
+import tempfile
+
+import pyJianYingDraft as draft
+
+from .common import make_large_draft, measure
+
+SEGMENT_COUNT = 5000
+REPEAT = 20
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        json_path = make_large_draft(folder, "large", SEGMENT_COUNT)
+        script = draft.Script_file.load_template(json_path)
+        # 模拟典型用法: 替换前先访问一次轨道片段
+        script.get_imported_track(draft.Track_type.video).segments
+
+        reload_time = measure(lambda: draft.Script_file.load_template(json_path), REPEAT)
+        fork_time = measure(script.fork, REPEAT)
+
+    print("草稿片段数: %d (视频) + %d (文本)" % (SEGMENT_COUNT, SEGMENT_COUNT))
+    print("重新加载: %8.2f ms" % (reload_time * 1e3))
+    print("fork:     %8.2f ms (%.1fx)" % (fork_time * 1e3, reload_time / fork_time))
+
+if __name__ == "__main__":
+    main()
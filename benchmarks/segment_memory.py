@@ -0,0 +1,119 @@
+"""使用tracemalloc统计每个片段对象(含其时间范围、变速、图像调节设置及关键帧等)占用的内存, 并与使用`__dict__`存储属性时对比
+
+对比方式: 收集片段中所有定义了`__slots__`的对象, 分别以原类型(槽)及与之对应的普通类(实例字典)重建这些对象的"外壳",
+属性值仍引用原有对象, 两者的内存差即为改用`__slots__`节省的内存.
+注意"__dict__"一列是以普通类模拟得到的估计值, 并非实测未使用`__slots__`的旧版本片段
+"""
+
+import os
+import gc
+import tracemalloc
+from enum import Enum
+
+from typing import Callable, Dict, List, Set, Any
+
+import pyJianYingDraft as draft
+from pyJianYingDraft import Timerange, Keyframe_property
+
+from .common import TUTORIAL_ASSET_DIR
+
+SEGMENT_COUNT = 20000
+SEGMENT_DURATION = 100000
+
+_dict_backed_types: Dict[type, type] = {}
+"""原类型 -> 以实例字典存储属性的同名普通类, 用于模拟未使用`__slots__`时的对象. 每个原类型对应一个类, 以便共享实例字典的键"""
+
+def _slot_names(cls: type) -> List[str]:
+    return [name for klass in cls.__mro__ for name in klass.__dict__.get("__slots__", ())]
+
+def _collect_slotted(obj: Any, found: List[Any], seen: Set[int]) -> None:
+    """收集`obj`引用的所有只以槽存储属性的对象"""
+    if id(obj) in seen or isinstance(obj, (str, bytes, int, float, bool, type, Enum)) or obj is None:
+        return
+    seen.add(id(obj))
+    if isinstance(obj, (list, tuple, set)):
+        children: List[Any] = list(obj)
+    elif isinstance(obj, dict):
+        children = list(obj.values())
+    elif hasattr(obj, "__dict__"):
+        children = list(vars(obj).values())
+    else:
+        names = _slot_names(type(obj))
+        if not names:
+            return
+        found.append(obj)
+        children = [getattr(obj, name) for name in names if hasattr(obj, name)]
+    for child in children:
+        _collect_slotted(child, found, seen)
+
+def _rebuild_shell(obj: Any, dict_backed: bool) -> Any:
+    if dict_backed:
+        dict_type = _dict_backed_types.setdefault(type(obj), type(type(obj).__name__, (), {}))
+        shell: Any = dict_type()
+        for name in _slot_names(type(obj)):
+            if hasattr(obj, name):
+                setattr(shell, name, getattr(obj, name))
+        return shell
+    shell = type(obj).__new__(type(obj))
+    for name in _slot_names(type(obj)):
+        if hasattr(obj, name):
+            object.__setattr__(shell, name, getattr(obj, name))
+    return shell
+
+def measure_memory(factory: Callable[[int], Any]) -> float:
+    """返回`factory`构造的每个对象平均占用的内存(字节)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects: List[Any] = [factory(i) for i in range(SEGMENT_COUNT)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / SEGMENT_COUNT
+
+def measure_slots_saving(factory: Callable[[int], Any]) -> float:
+    """返回`factory`构造的每个对象中, 槽对象改用实例字典时平均多占用的内存(字节)"""
+    objects = [factory(i) for i in range(SEGMENT_COUNT)]
+    slotted: List[Any] = []
+    for obj in objects:
+        _collect_slotted(obj, slotted, set())
+
+    usage: List[float] = []
+    for dict_backed in (False, True):
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        shells = [_rebuild_shell(obj, dict_backed) for obj in slotted]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del shells
+        usage.append((after - before) / SEGMENT_COUNT)
+    return usage[1] - usage[0]
+
+def main() -> None:
+    video_material = draft.Video_material(os.path.join(TUTORIAL_ASSET_DIR, "video.mp4"))
+
+    def make_timerange(i: int) -> Timerange:
+        return Timerange(i, SEGMENT_DURATION)
+
+    def make_video_segment(i: int) -> draft.Video_segment:
+        segment = draft.Video_segment(video_material, Timerange(i * SEGMENT_DURATION, SEGMENT_DURATION))
+        segment.add_keyframe(Keyframe_property.alpha, 0, 1.0)
+        return segment
+
+    def make_text_segment(i: int) -> draft.Text_segment:
+        return draft.Text_segment("字幕", Timerange(i * SEGMENT_DURATION, SEGMENT_DURATION))
+
+    print("对象数: %d" % SEGMENT_COUNT)
+    print("%-14s %12s %14s %8s" % ("", "__slots__", "__dict__(模拟)", "节省"))
+    for name, factory in [("Timerange", make_timerange),
+                          ("Video_segment", make_video_segment),
+                          ("Text_segment", make_text_segment)]:
+        slotted = measure_memory(factory)
+        dict_backed = slotted + measure_slots_saving(factory)
+        print("%-14s %10.1f B %12.1f B %7.1f%%" % (name, slotted, dict_backed, (1 - slotted / dict_backed) * 100))
+    print("注: Video_segment含其素材副本")
+    print("注: __dict__一列为模拟值, 由同名普通类重建各槽对象的外壳后测得, 并非实测旧版本的片段")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""比较解析JSON与读取二进制快照加载草稿内容的耗时"""
+
+import tempfile
+
+from pyJianYingDraft.draft_snapshot import load_draft_content
+
+from .common import make_large_draft, measure
+
+SEGMENT_COUNTS = [100, 1000, 10000]
+REPEAT = 10
+
+def main() -> None:
+    print("%8s %12s %12s %8s" % ("片段数", "JSON(ms)", "快照(ms)", "加速比"))
+    for segment_count in SEGMENT_COUNTS:
+        with tempfile.TemporaryDirectory() as folder:
+            json_path = make_large_draft(folder, "large", segment_count)
+            load_draft_content(json_path, use_snapshot=True, snapshot_dir=folder)  # 生成快照
+
+            json_time = measure(lambda: load_draft_content(json_path), REPEAT)
+            snapshot_time = measure(lambda: load_draft_content(json_path, use_snapshot=True, snapshot_dir=folder), REPEAT)
+
+        print("%8d %12.2f %12.2f %7.1fx" % (segment_count, json_time * 1e3, snapshot_time * 1e3, json_time / snapshot_time))
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
-from .local_materials import Crop_settings, Video_material, Audio_material
+from .local_materials import Crop_settings, Video_material, Audio_material, set_material_id_strategy
+from .media_probe import Probe_cache, Probe_result, Media_info, Stream_info, set_probe_cache, probe_file, file_fingerprint
+from .waveform import set_waveform_resolution, audio_waveform
 from .keyframe import Keyframe_property
 
 from .time_util import Timerange
@@ -18,7 +20,9 @@ from .metadata import Video_scene_effect_type, Video_character_effect_type
 from .track import Track_type
 from .template_mode import Shrink_mode, Extend_mode
 from .script_file import Script_file
+from .timeline_index import Timeline_item
 from .draft_folder import Draft_folder
+from .batch_variants import Variant_job, Variant_result, Segment_replacement, Name_replacement, Text_replacement
 from .jianying_controller import Jianying_controller, Export_resolution, Export_framerate
 
 from .time_util import SEC, tim, trange
@@ -42,6 +46,16 @@ __all__ = [
     "Crop_settings",
     "Video_material",
     "Audio_material",
+    "set_material_id_strategy",
+    "Probe_cache",
+    "Probe_result",
+    "Media_info",
+    "Stream_info",
+    "probe_file",
+    "file_fingerprint",
+    "set_waveform_resolution",
+    "audio_waveform",
+    "set_probe_cache",
     "Keyframe_property",
     "Timerange",
     "Audio_segment",
@@ -58,7 +72,13 @@ __all__ = [
     "Shrink_mode",
     "Extend_mode",
     "Script_file",
+    "Timeline_item",
     "Draft_folder",
+    "Variant_job",
+    "Variant_result",
+    "Segment_replacement",
+    "Name_replacement",
+    "Text_replacement",
     "Jianying_controller",
     "Export_resolution",
     "Export_framerate",
@@ -102,6 +102,8 @@ class Audio_effect:
 class Audio_segment(Media_segment):
     """安放在轨道上的一个音频片段"""
 
+    __slots__ = ("material_instance", "fade", "effects")
+
     material_instance: Audio_material
     """音频素材实例"""
 
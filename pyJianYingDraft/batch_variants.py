@@ -0,0 +1,110 @@
+"""批量生成模板变体时使用的任务描述类"""
+
+from dataclasses import dataclass, field
+
+from typing import Optional, Union
+from typing import List
+
+from .time_util import Timerange
+from .track import Track_type
+from .local_materials import Video_material, Audio_material
+from .template_mode import Shrink_mode, Extend_mode
+from .script_file import Script_file
+
+@dataclass
+class Segment_replacement:
+    """根据片段替换素材, 参数含义与`Script_file.replace_material_by_seg`一致"""
+
+    segment_index: int
+    """要替换素材的片段下标, 从0开始"""
+    material: Union[Video_material, Audio_material]
+    """新素材, 必须与原素材类型一致"""
+
+    track_type: Track_type = Track_type.video
+    """片段所在的导入轨道类型"""
+    track_name: Optional[str] = None
+    """片段所在的导入轨道名称, 为None时不根据名称筛选"""
+    track_index: Optional[int] = None
+    """片段所在的轨道在同类型导入轨道中的下标, 为None时不根据下标筛选"""
+
+    source_timerange: Optional[Timerange] = None
+    """从原素材中截取的时间范围, 默认为全时段"""
+    handle_shrink: Shrink_mode = Shrink_mode.cut_tail
+    """新素材比原素材短时的处理方式"""
+    handle_extend: Union[Extend_mode, List[Extend_mode]] = Extend_mode.cut_material_tail
+    """新素材比原素材长时的处理方式"""
+
+@dataclass
+class Name_replacement:
+    """根据名称替换素材, 参数含义与`Script_file.replace_material_by_name`一致"""
+
+    material_name: str
+    """要替换的素材名称"""
+    material: Union[Video_material, Audio_material]
+    """新素材"""
+    replace_crop: bool = False
+    """是否替换原素材的裁剪设置"""
+
+@dataclass
+class Text_replacement:
+    """替换文本片段的内容, 参数含义与`Script_file.replace_text`一致"""
+
+    segment_index: int
+    """要替换文字的片段下标, 从0开始"""
+    text: Union[str, List[str]]
+    """新的文字内容, 对于文本模板而言应传入一个字符串列表"""
+
+    track_name: Optional[str] = None
+    """片段所在的导入文本轨道名称, 为None时不根据名称筛选"""
+    track_index: Optional[int] = None
+    """片段所在的轨道在导入文本轨道中的下标, 为None时不根据下标筛选"""
+    recalc_style: bool = True
+    """是否重新计算字体样式分布"""
+
+@dataclass
+class Variant_job:
+    """一个变体草稿的生成任务, 由`Draft_folder.build_variants`执行
+
+    任务会被传递给子进程, 因此其中的素材等对象都必须是可pickle的
+    """
+
+    draft_name: str
+    """生成的新草稿名称"""
+    material_replacements: List[Union[Segment_replacement, Name_replacement]] = field(default_factory=list)
+    """素材替换操作, 按顺序执行"""
+    text_replacements: List[Text_replacement] = field(default_factory=list)
+    """文本替换操作, 在素材替换之后按顺序执行"""
+    allow_replace: bool = False
+    """是否允许覆盖与`draft_name`重名的草稿"""
+
+    def apply(self, script: Script_file) -> Script_file:
+        """在给定的草稿上执行此任务中的所有替换操作"""
+        for replacement in self.material_replacements:
+            if isinstance(replacement, Name_replacement):
+                script.replace_material_by_name(replacement.material_name, replacement.material, replacement.replace_crop)
+                continue
+            track = script.get_imported_track(replacement.track_type, replacement.track_name, replacement.track_index)  # type: ignore
+            script.replace_material_by_seg(track, replacement.segment_index, replacement.material, replacement.source_timerange,
+                                           handle_shrink=replacement.handle_shrink, handle_extend=replacement.handle_extend)
+
+        for text_replacement in self.text_replacements:
+            track = script.get_imported_track(Track_type.text, text_replacement.track_name, text_replacement.track_index)
+            script.replace_text(track, text_replacement.segment_index, text_replacement.text, text_replacement.recalc_style)
+
+        return script
+
+@dataclass
+class Variant_result:
+    """一个变体草稿的生成结果"""
+
+    draft_name: str
+    """新草稿名称"""
+    error: Optional[str] = None
+    """生成失败时抛出的异常(`repr`形式), 成功时为None. 异常本身不一定可pickle, 故不直接传回"""
+    traceback: Optional[str] = None
+    """生成失败时的完整调用栈, 成功时为None"""
+
+    @property
+    def success(self) -> bool:
+        """是否生成成功"""
+        return self.error is None
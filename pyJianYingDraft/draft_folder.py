@@ -2,27 +2,50 @@
 
 import os
 import shutil
+import marshal
+import threading
+import traceback
+from functools import partial
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-from typing import List
+from typing import ClassVar, Optional, Tuple
+from typing import Dict, List, Any
 
 from .script_file import Script_file
+from .draft_snapshot import load_draft_content, SNAPSHOT_SUFFIX
+from .batch_variants import Variant_job, Variant_result
 
 class Draft_folder:
     """管理一个文件夹及其内的一系列草稿"""
 
     folder_path: str
     """根路径"""
-
-    def __init__(self, folder_path: str):
+    use_snapshot: bool
+    """加载模板时是否使用二进制快照跳过JSON解析"""
+    snapshot_dir: Optional[str]
+    """存放快照的文件夹, 为None时使用用户缓存目录下的默认位置"""
+
+    template_cache_size: ClassVar[int] = 8
+    """进程内缓存的已解析模板数量上限, 超出时淘汰最久未使用的模板. 设为0以禁用缓存"""
+    _template_cache: ClassVar["OrderedDict[str, Tuple[int, int, bytes]]"] = OrderedDict()
+    """已解析模板的缓存, 键为JSON文件的绝对路径, 值为(修改时间, 文件大小, `marshal`序列化后的解析结果)"""
+    _template_cache_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, folder_path: str, *, use_snapshot: bool = False, snapshot_dir: Optional[str] = None):
         """初始化草稿文件夹管理器
 
         Args:
             folder_path (`str`): 包含若干草稿的文件夹, 一般取剪映保存草稿的位置即可
+            use_snapshot (`bool`, optional): 加载模板时是否使用二进制快照跳过JSON解析, 快照在JSON文件变化时自动失效. 默认不使用.
+            snapshot_dir (`str`, optional): 存放快照的文件夹, 默认位于用户的缓存目录下.
 
         Raises:
             `FileNotFoundError`: 路径不存在
         """
         self.folder_path = folder_path
+        self.use_snapshot = use_snapshot
+        self.snapshot_dir = snapshot_dir
 
         if not os.path.exists(self.folder_path):
             raise FileNotFoundError(f"根文件夹 {self.folder_path} 不存在")
@@ -65,11 +88,15 @@ class Draft_folder:
         script_file = self.load_template(draft_name)
         script_file.inspect_material()
 
-    def load_template(self, draft_name: str) -> Script_file:
+    def load_template(self, draft_name: str, *, use_cache: bool = True) -> Script_file:
         """在文件夹中打开一个草稿作为模板, 并在其上进行编辑
 
+        解析结果以`marshal`格式缓存在进程内(以文件路径、修改时间及大小为键), 再次打开同一草稿时从缓存反序列化出一份完全独立的草稿内容,
+        代价远低于重新解析JSON. 对返回对象的任何编辑(包括直接修改`content`或`imported_materials`中的数据)都不会影响缓存或其它草稿对象
+
         Args:
             draft_name (`str`): 草稿名称, 即相应文件夹名称
+            use_cache (`bool`, optional): 是否使用已解析模板的缓存, 默认为是.
 
         Returns:
             `Script_file`: 以模板模式打开的草稿对象
@@ -81,7 +108,47 @@ class Draft_folder:
         if not os.path.exists(draft_path):
             raise FileNotFoundError(f"草稿文件夹 {draft_name} 不存在")
 
-        return Script_file.load_template(os.path.join(draft_path, "draft_content.json"))
+        json_path = os.path.join(draft_path, "draft_content.json")
+        if not use_cache or self.template_cache_size <= 0:
+            return Script_file.load_template(json_path, use_snapshot=self.use_snapshot, snapshot_dir=self.snapshot_dir)
+        return Script_file._from_template_content(json_path, self._load_parsed_template(json_path))
+
+    def _load_parsed_template(self, json_path: str) -> Dict[str, Any]:
+        """获取JSON文件的解析结果, 文件未发生变化时从缓存反序列化, 每次返回的都是独立的对象
+
+        Raises:
+            `FileNotFoundError`: JSON文件不存在
+        """
+        if not os.path.exists(json_path):
+            raise FileNotFoundError("JSON文件 '%s' 不存在" % json_path)
+        key = os.path.abspath(json_path)
+        stat = os.stat(json_path)
+
+        cls = type(self)
+        data: Optional[bytes] = None
+        with cls._template_cache_lock:
+            cached = cls._template_cache.get(key)
+            if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                cls._template_cache.move_to_end(key)
+                data = cached[2]
+        if data is not None:
+            return marshal.loads(data)
+
+        content = load_draft_content(json_path, use_snapshot=self.use_snapshot, snapshot_dir=self.snapshot_dir)
+        data = marshal.dumps(content)
+
+        with cls._template_cache_lock:
+            cls._template_cache[key] = (stat.st_mtime_ns, stat.st_size, data)
+            cls._template_cache.move_to_end(key)
+            while len(cls._template_cache) > cls.template_cache_size:
+                cls._template_cache.popitem(last=False)
+        return content
+
+    @classmethod
+    def clear_template_cache(cls) -> None:
+        """清空进程内的已解析模板缓存"""
+        with cls._template_cache_lock:
+            cls._template_cache.clear()
 
     def duplicate_as_template(self, template_name: str, new_draft_name: str, allow_replace: bool = False) -> Script_file:
         """复制一份给定的草稿, 并在复制出的新草稿上进行编辑
@@ -94,6 +161,21 @@ class Draft_folder:
         Returns:
             `Script_file`: 以模板模式打开的**复制后的**草稿对象
 
+        Raises:
+            `FileNotFoundError`: 原始草稿不存在
+            `FileExistsError`: 已存在与`new_draft_name`重名的草稿, 但不允许覆盖.
+        """
+        self._copy_draft(template_name, new_draft_name, allow_replace)
+
+        # 打开草稿, 新草稿通常只会打开一次, 不放入缓存以免挤占真正被复用的模板
+        return self.load_template(new_draft_name, use_cache=False)
+
+    def _copy_draft(self, template_name: str, new_draft_name: str, allow_replace: bool, *, copy_content: bool = True) -> str:
+        """复制草稿文件夹, 返回新草稿的路径
+
+        Args:
+            copy_content (`bool`, optional): 是否复制`draft_content.json`, 调用方随后会自行写入时可以跳过. 默认为是.
+
         Raises:
             `FileNotFoundError`: 原始草稿不存在
             `FileExistsError`: 已存在与`new_draft_name`重名的草稿, 但不允许覆盖.
@@ -105,8 +187,65 @@ class Draft_folder:
         if os.path.exists(new_draft_path) and not allow_replace:
             raise FileExistsError(f"新草稿 {new_draft_name} 已存在且不允许覆盖")
 
-        # 复制草稿文件夹
-        shutil.copytree(template_path, new_draft_path, dirs_exist_ok=allow_replace)
+        # 复制草稿文件夹, 跳过(旧版本写在草稿文件夹中的)快照文件
+        def ignore_files(path: str, names: List[str]) -> List[str]:
+            ignored = [name for name in names if name.endswith(SNAPSHOT_SUFFIX)]
+            if not copy_content and os.path.abspath(path) == os.path.abspath(template_path):
+                ignored.append("draft_content.json")
+            return ignored
+        shutil.copytree(template_path, new_draft_path, dirs_exist_ok=allow_replace, ignore=ignore_files)
+        return new_draft_path
+
+    def build_variants(self, template_name: str, jobs: List[Variant_job], *, workers: Optional[int] = None) -> List[Variant_result]:
+        """基于同一模板并行地生成一批新草稿
+
+        每个任务描述了一系列素材及文本替换操作以及新草稿的名称, 各任务在进程池中执行.
+        每个工作进程只解析一次模板, 之后的任务均基于其缓存构造草稿对象.
+
+        注意: 在Windows上使用进程池时, 调用方脚本需要有`if __name__ == "__main__":`保护
+
+        Args:
+            template_name (`str`): 模板草稿名称
+            jobs (`List[Variant_job]`): 生成任务列表, 其中的素材等对象必须是可pickle的
+            workers (`int`, optional): 工作进程数, 默认为CPU核心数. 为1时直接在当前进程中顺序执行.
+
+        Returns:
+            `List[Variant_result]`: 与`jobs`一一对应的生成结果, 单个任务的失败不会影响其它任务
+
+        Raises:
+            `FileNotFoundError`: 模板草稿不存在
+        """
+        template_path = os.path.join(self.folder_path, template_name)
+        if not os.path.exists(template_path):
+            raise FileNotFoundError(f"模板草稿 {template_name} 不存在")
 
-        # 打开草稿
-        return self.load_template(new_draft_name)
+        worker_func = partial(_build_variant, self, template_name)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(jobs))
+        if workers <= 1:
+            return [worker_func(job) for job in jobs]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            return list(executor.map(worker_func, jobs, chunksize=chunksize))
+
+def _build_variant(draft_folder: Draft_folder, template_name: str, job: Variant_job) -> Variant_result:
+    """在工作进程中执行单个变体任务, 模板的解析结果由`Draft_folder`的进程内缓存复用
+
+    只有被反复使用的模板会进入缓存, 生成的新草稿直接写入文件, 不会被解析或缓存.
+    失败时删除本任务新建的草稿文件夹(不删除`allow_replace`时已存在的草稿), 并以字符串形式返回异常, 以免异常无法pickle
+    """
+    new_draft_path = os.path.join(draft_folder.folder_path, job.draft_name)
+    created = not os.path.exists(new_draft_path)
+    try:
+        script = job.apply(draft_folder.load_template(template_name, use_cache=True))
+
+        draft_folder._copy_draft(template_name, job.draft_name, job.allow_replace, copy_content=False)
+        script.save_path = os.path.join(new_draft_path, "draft_content.json")
+        script.save()
+        return Variant_result(job.draft_name)
+    except Exception as e:
+        if created and os.path.isdir(new_draft_path):
+            shutil.rmtree(new_draft_path, ignore_errors=True)
+        return Variant_result(job.draft_name, repr(e), traceback.format_exc())
@@ -0,0 +1,108 @@
+"""已解析草稿内容的二进制快照, 用于跳过JSON解析
+
+快照使用`marshal`格式存储, 文件头中记录了快照格式版本、Python版本以及对应JSON文件的修改时间和大小,
+任何一项不匹配时快照即视为失效, 此时将重新解析JSON并覆盖快照.
+快照默认存放在用户的缓存目录下, 而非剪映的草稿文件夹中, 以免被剪映或草稿复制操作带到其它草稿里
+"""
+
+import os
+import sys
+import json
+import uuid
+import struct
+import marshal
+import hashlib
+
+from typing import Optional
+from typing import Dict, Any
+
+SNAPSHOT_MAGIC = b"PJYDSNAP"
+"""快照文件的标识"""
+SNAPSHOT_VERSION = 1
+"""快照格式版本, 格式变化时递增"""
+SNAPSHOT_SUFFIX = ".snapshot"
+"""快照文件的后缀名"""
+
+_HEADER = struct.Struct("<8sHBBHqq")
+"""文件头: 标识, 快照格式版本, Python主版本, Python次版本, marshal版本, JSON修改时间(纳秒), JSON文件大小"""
+
+def default_snapshot_dir() -> str:
+    """默认存放快照的文件夹: Windows下位于`%LOCALAPPDATA%`, 其它系统下位于`$XDG_CACHE_HOME`或`~/.cache`"""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") \
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pyJianYingDraft", "snapshots")
+
+def snapshot_path(json_path: str, snapshot_dir: Optional[str] = None) -> str:
+    """获取JSON文件对应的快照路径, 以JSON文件绝对路径的摘要作为快照文件名, 以免不同草稿的快照互相冲突
+
+    Args:
+        json_path (`str`): JSON文件路径
+        snapshot_dir (`str`, optional): 存放快照的文件夹, 默认为`default_snapshot_dir()`.
+    """
+    if snapshot_dir is None:
+        snapshot_dir = default_snapshot_dir()
+    digest = hashlib.sha1(os.path.abspath(json_path).encode("utf-8")).hexdigest()
+    return os.path.join(snapshot_dir, digest + SNAPSHOT_SUFFIX)
+
+def _make_header(stat: os.stat_result) -> bytes:
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.version_info[0], sys.version_info[1],
+                        marshal.version, stat.st_mtime_ns, stat.st_size)
+
+def read_snapshot(json_path: str, snapshot_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """读取JSON文件对应的快照, 快照不存在、已失效或已损坏时返回None"""
+    path = snapshot_path(json_path, snapshot_dir)
+    try:
+        header = _make_header(os.stat(json_path))
+        with open(path, "rb") as f:
+            if f.read(_HEADER.size) != header:
+                return None
+            content = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return content if isinstance(content, dict) else None
+
+def write_snapshot(json_path: str, content: Dict[str, Any], snapshot_dir: Optional[str] = None) -> bool:
+    """为JSON文件写入快照, 返回是否写入成功
+
+    快照仅作为缓存, 写入失败(如没有写权限)时不抛出异常
+    """
+    path = snapshot_path(json_path, snapshot_dir)
+    temp_path = "%s.%s.tmp" % (path, uuid.uuid4().hex)
+    try:
+        data = _make_header(os.stat(json_path)) + marshal.dumps(content)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, "xb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except (OSError, ValueError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    return True
+
+def load_draft_content(json_path: str, *, use_snapshot: bool = False, snapshot_dir: Optional[str] = None) -> Dict[str, Any]:
+    """读取并解析草稿JSON文件
+
+    Args:
+        json_path (`str`): JSON文件路径
+        use_snapshot (`bool`, optional): 是否使用二进制快照. 启用时若快照有效则直接从快照加载, 否则解析JSON后写入快照. 默认不使用.
+        snapshot_dir (`str`, optional): 存放快照的文件夹, 默认为`default_snapshot_dir()`.
+
+    Raises:
+        `FileNotFoundError`: JSON文件不存在
+    """
+    if not os.path.exists(json_path):
+        raise FileNotFoundError("JSON文件 '%s' 不存在" % json_path)
+
+    if use_snapshot:
+        content = read_snapshot(json_path, snapshot_dir)
+        if content is not None:
+            return content
+
+    stat = os.stat(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    # 解析期间文件发生变化时不写入快照, 以免快照与文件头记录的版本不符
+    if use_snapshot and _make_header(os.stat(json_path)) == _make_header(stat):
+        write_snapshot(json_path, content, snapshot_dir)
+    return content
@@ -0,0 +1,140 @@
+"""草稿导出时使用的JSON片段缓存"""
+
+import json
+import hashlib
+from collections import OrderedDict
+
+from typing import Optional, Iterator
+from typing import Dict, List, Set, Tuple, Any
+
+class Export_cache:
+    """按素材列表及轨道逐段编码草稿内容, 可选地缓存带缩进的JSON片段, 重复导出时只重新做带缩进编码的发生变化的部分
+
+    默认不缓存任何片段, 每段编码后即交给调用方, 不会在草稿对象中保留编码结果.
+    启用缓存(`max_size`大于0)时, 由于片段/素材对象的属性也可能被直接修改, 每次导出时仍会对各部分做紧凑编码
+    (由C实现的编码器生成, 代价远低于带缩进的编码)并以其摘要判断该部分是否变化; 紧凑格式的输出不使用缓存.
+    缓存的片段总长度不超过`max_size`个字符, 超出时淘汰最久未使用的片段
+    """
+
+    max_size: int
+    """缓存片段的总字符数上限, 为0时不缓存"""
+    indent: Optional[int]
+    """缓存片段所对应的缩进设置"""
+    fragments: "OrderedDict[str, Tuple[bytes, str]]"
+    """各部分的缓存, 键为部分名称, 值为(紧凑编码的摘要, 带缩进的片段)"""
+    size: int
+    """当前缓存片段的总字符数"""
+
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self.indent = None
+        self.fragments = OrderedDict()
+        self.size = 0
+
+        self._compact_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        self._encoder = self._compact_encoder
+
+    @staticmethod
+    def material_section(material_type: str) -> str:
+        """素材列表对应的部分名称"""
+        return "materials/" + material_type
+
+    @staticmethod
+    def track_section(track_id: str) -> str:
+        """轨道对应的部分名称"""
+        return "tracks/" + track_id
+
+    def fork(self) -> "Export_cache":
+        """创建一个容量相同的空缓存, 不继承已缓存的片段"""
+        return Export_cache(self.max_size)
+
+    def resize(self, max_size: int) -> None:
+        """调整缓存容量, 为0时清空并禁用缓存"""
+        self.max_size = max_size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.fragments and self.size > self.max_size:
+            _, (_, fragment) = self.fragments.popitem(last=False)
+            self.size -= len(fragment)
+
+    def _store(self, section: str, digest: bytes, fragment: str) -> None:
+        old = self.fragments.pop(section, None)
+        if old is not None:
+            self.size -= len(old[1])
+        if len(fragment) > self.max_size:  # 单个片段超出容量时不缓存
+            return
+        self.fragments[section] = (digest, fragment)
+        self.size += len(fragment)
+        self._evict()
+
+    def _newline(self, level: int) -> str:
+        if self.indent is None:
+            return ""
+        return "\n" + " " * (self.indent * level)
+
+    def _encode(self, obj: Any, level: int) -> str:
+        """编码一个位于第`level`层的JSON值
+
+        JSON字符串中的换行总会被转义, 故编码结果中的换行都是缩进产生的, 可以直接替换以调整层级
+        """
+        if self.indent is None:
+            return self._compact_encoder.encode(obj)
+        return self._encoder.encode(obj).replace("\n", self._newline(level))
+
+    def _encode_section(self, section: str, obj: Any, level: int, seen: Set[str]) -> str:
+        if self.indent is None or self.max_size <= 0:
+            return self._encode(obj, level)
+
+        seen.add(section)
+        compact = self._compact_encoder.encode(obj)
+        digest = hashlib.blake2b(compact.encode("utf-8"), digest_size=16).digest()
+        cached = self.fragments.get(section)
+        if cached is not None and cached[0] == digest:
+            self.fragments.move_to_end(section)
+            return cached[1]
+
+        fragment = self._encode(obj, level)
+        self._store(section, digest, fragment)
+        return fragment
+
+    def iterencode(self, content: Dict[str, Any], indent: Optional[int]) -> Iterator[str]:
+        """逐段编码草稿内容, 结果与`json.dumps(content, ensure_ascii=False, indent=indent)`一致(`indent`为None时为紧凑格式)
+
+        其中`materials`下的各素材列表以及`tracks`中的各轨道作为独立的部分进行编码及缓存
+        """
+        if indent != self.indent:
+            self.fragments.clear()
+            self.size = 0
+            self.indent = indent
+            if indent is None:
+                self._encoder = self._compact_encoder
+            else:
+                self._encoder = json.JSONEncoder(ensure_ascii=False, indent=indent)
+
+        key_separator = ":" if indent is None else ": "
+        seen: Set[str] = set()
+
+        yield "{"
+        for index, (key, value) in enumerate(content.items()):
+            yield ("," if index > 0 else "") + self._newline(1) + self._encode(key, 1) + key_separator
+            if key == "materials" and isinstance(value, dict) and len(value) > 0:
+                yield "{"
+                for mat_index, (material_type, material_list) in enumerate(value.items()):
+                    fragment = self._encode_section(self.material_section(material_type), material_list, 2, seen)
+                    yield ("," if mat_index > 0 else "") + self._newline(2) + self._encode(material_type, 2) + key_separator + fragment
+                yield self._newline(1) + "}"
+            elif key == "tracks" and isinstance(value, list) and len(value) > 0:
+                yield "["
+                for track_index, track_json in enumerate(value):
+                    fragment = self._encode_section(self.track_section(track_json["id"]), track_json, 2, seen)
+                    yield ("," if track_index > 0 else "") + self._newline(2) + fragment
+                yield self._newline(1) + "]"
+            else:
+                yield self._encode(value, 1)
+        yield self._newline(0) + "}"
+
+        # 清理已不存在的部分
+        stale: List[str] = [section for section in self.fragments if section not in seen]
+        for section in stale:
+            self.size -= len(self.fragments.pop(section)[1])
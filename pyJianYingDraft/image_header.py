@@ -0,0 +1,161 @@
+"""只读取文件头的图片尺寸及GIF时长解析器
+
+支持GIF, PNG, JPEG及WebP格式, 只需读取少量数据, 远快于完整解析文件. 无法识别或数据损坏时返回None,
+由调用方回退到完整的解析方式.
+"""
+
+import os
+import struct
+
+from typing import Optional, NamedTuple
+
+class Image_header(NamedTuple):
+    """图片文件头中的信息"""
+
+    format: str
+    """图片格式: GIF, PNG, JPEG或WebP"""
+    width: int
+    height: int
+    duration: Optional[int]
+    """GIF文件所有帧的延迟之和, 单位为微秒; 其它格式为None"""
+    frame_count: int
+    """帧数, 仅GIF文件可能大于1"""
+
+IMAGE_EXTENSIONS = {".gif", ".png", ".jpg", ".jpeg", ".jfif", ".webp"}
+"""尝试使用文件头解析的扩展名"""
+
+_HEAD_SIZE = 64 * 1024
+"""读取PNG, JPEG及WebP文件头时最多读取的字节数"""
+
+def read_image_header(path: str) -> Optional[Image_header]:
+    """读取图片文件的尺寸, 对GIF文件还会累加各帧的延迟得到总时长
+
+    Returns:
+        文件头信息, 不支持的格式或解析失败时返回None
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEAD_SIZE)
+            if head[:6] in (b"GIF87a", b"GIF89a"):
+                return _parse_gif(head + f.read())
+        if head[:8] == b"\x89PNG\r\n\x1a\n":
+            return _parse_png(head)
+        if head[:2] == b"\xff\xd8":
+            return _parse_jpeg(head, path)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _parse_webp(head)
+    except (OSError, struct.error, IndexError, ValueError):
+        return None
+    return None
+
+def _parse_gif(data: bytes) -> Optional[Image_header]:
+    width, height, flags = struct.unpack_from("<HHB", data, 6)
+    pos = 13
+    if flags & 0x80:  # 全局颜色表
+        pos += 3 << ((flags & 0x07) + 1)
+
+    total_delay = 0  # 单位为1/100秒
+    frame_count = 0
+    while True:
+        block = data[pos]
+        if block == 0x3B:  # 文件结束
+            break
+        elif block == 0x21:  # 扩展块
+            label = data[pos + 1]
+            pos += 2
+            if label == 0xF9 and data[pos] >= 4:  # Graphic Control Extension
+                total_delay += struct.unpack_from("<H", data, pos + 2)[0]
+            pos = _skip_sub_blocks(data, pos)
+        elif block == 0x2C:  # 图像描述符
+            frame_count += 1
+            local_flags = data[pos + 9]
+            pos += 10
+            if local_flags & 0x80:  # 局部颜色表
+                pos += 3 << ((local_flags & 0x07) + 1)
+            pos += 1  # LZW最小码长
+            pos = _skip_sub_blocks(data, pos)
+        else:
+            return None
+        if pos >= len(data):  # 文件被截断
+            return None
+
+    if frame_count == 0 or width == 0 or height == 0:
+        return None
+    return Image_header("GIF", width, height, total_delay * 10000, frame_count)
+
+def _skip_sub_blocks(data: bytes, pos: int) -> int:
+    """跳过从`pos`开始的一系列数据子块(以长度为0的子块结束), 返回其后的位置"""
+    while True:
+        size = data[pos]
+        pos += 1
+        if size == 0:
+            return pos
+        pos += size
+
+def _parse_png(head: bytes) -> Optional[Image_header]:
+    if head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack_from(">II", head, 16)
+    if width == 0 or height == 0:
+        return None
+    return Image_header("PNG", width, height, None, 1)
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+"""JPEG中包含图像尺寸的SOF标记, 不包括同属0xC*范围的DHT(0xC4), JPG(0xC8)及DAC(0xCC)"""
+
+def _parse_jpeg(head: bytes, path: str) -> Optional[Image_header]:
+    data = head
+    pos = 2
+    while True:
+        # 段可能跨越已读取的数据(如较大的EXIF), 此时按需补读
+        if pos + 12 > len(data):
+            data = _read_more(path, data, pos + 12)
+            if pos + 12 > len(data):
+                return None
+        if data[pos] != 0xFF:
+            return None
+        # 标记前可能有若干填充的0xFF
+        while data[pos] == 0xFF:
+            pos += 1
+        marker = data[pos]
+        pos += 1
+        if marker == 0xD8 or marker == 0x01 or 0xD0 <= marker <= 0xD7:  # 没有数据段的标记
+            continue
+        if marker in (0xD9, 0xDA):  # 图像结束或扫描开始, 在此之前未找到SOF
+            return None
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack_from(">HH", data, pos + 3)
+            if width == 0 or height == 0:
+                return None
+            return Image_header("JPEG", width, height, None, 1)
+        pos += struct.unpack_from(">H", data, pos)[0]  # 段长度包含自身的2字节
+
+def _read_more(path: str, data: bytes, needed: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(len(data))
+        return data + f.read(max(needed - len(data), _HEAD_SIZE))
+
+def _parse_webp(head: bytes) -> Optional[Image_header]:
+    chunk = head[12:16]
+    if chunk == b"VP8X":  # 扩展格式, 画布尺寸以24位存储
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+    elif chunk == b"VP8 ":  # 有损格式
+        if head[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack_from("<HH", head, 26)
+        width, height = width & 0x3FFF, height & 0x3FFF
+    elif chunk == b"VP8L":  # 无损格式
+        if head[20] != 0x2F:
+            return None
+        bits = int.from_bytes(head[21:25], "little")
+        width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    else:
+        return None
+    if width == 0 or height == 0:
+        return None
+    return Image_header("WebP", width, height, None, 1)
+
+def is_image_path(path: str) -> bool:
+    """根据扩展名判断是否应当尝试解析文件头"""
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
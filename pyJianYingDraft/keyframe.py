@@ -3,9 +3,14 @@ import uuid
 from enum import Enum
 from typing import Dict, List, Any
 
+from . import util
+
 class Keyframe:
     """一个关键帧（关键点）, 目前只支持线性插值"""
 
+    __slots__ = ("kf_id", "time_offset", "values")
+    __reduce_ex__ = util.slots_reduce_ex
+
     kf_id: str
     """关键帧全局id, 自动生成"""
     time_offset: int
@@ -65,6 +70,9 @@ class Keyframe_property(Enum):
 class Keyframe_list:
     """关键帧列表, 记录与某个特定属性相关的一系列关键帧"""
 
+    __slots__ = ("list_id", "keyframe_property", "keyframes")
+    __reduce_ex__ = util.slots_reduce_ex
+
     list_id: str
     """关键帧列表全局id, 自动生成"""
     keyframe_property: Keyframe_property
@@ -1,13 +1,103 @@
 import os
 import uuid
-import pymediainfo
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import Optional, Literal
-from typing import Dict, Any
+from typing import Optional, Literal, TypeVar, Callable
+from typing import Dict, List, Tuple, Sequence, Any
+
+from . import util
+from .media_probe import Probe_result, Probe_cache, probe_file, file_fingerprint
+from . import waveform
+
+PHOTO_DURATION = 10800000000
+"""图片素材的时长, 相当于3h"""
+
+Material_id_strategy = Literal["name", "fingerprint"]
+"""素材id的生成方式: 根据素材名称生成, 或根据文件的抽样内容指纹生成"""
+
+_id_strategy: Material_id_strategy = "name"
+
+def set_material_id_strategy(strategy: Material_id_strategy) -> Material_id_strategy:
+    """设置此后构造的本地素材的id生成方式, 返回此前的设置
+
+    默认的"name"方式根据素材名称(默认为文件名)生成id, 因此不同文件夹下的同名文件会得到相同的id, 在添加到草稿时被当作同一素材;
+    "fingerprint"方式则根据文件大小及开头、中间、结尾各一块数据的哈希值生成id, 内容相同的文件才会得到相同的id.
+
+    Raises:
+        `ValueError`: 不支持的生成方式
+    """
+    global _id_strategy
+    if strategy not in ("name", "fingerprint"):
+        raise ValueError(f"不支持的素材id生成方式 '{strategy}'")
+    previous, _id_strategy = _id_strategy, strategy
+    return previous
+
+def _make_material_id(path: str, material_name: str) -> str:
+    if _id_strategy == "fingerprint":
+        return file_fingerprint(path)
+    return uuid.uuid3(uuid.NAMESPACE_DNS, material_name).hex
+
+def probe_media(path: str, kind: Literal["video", "audio"], cache: Optional[Probe_cache] = None) -> Probe_result:
+    """探测构造素材所需的类型、时长及尺寸, 文件本身的探测结果来自`probe_file`, 因而会使用进程内缓存及持久化缓存
+
+    Args:
+        path (`str`): 素材文件路径
+        kind (`str`): 按视频(图片)素材("video")或音频素材("audio")探测
+        cache (`Probe_cache`, optional): 使用的持久化缓存, 默认使用`set_probe_cache`设置的全局缓存
+
+    Raises:
+        `ValueError`: 不支持的素材文件类型
+    """
+    info = probe_file(path, cache)
+    if kind == "audio":
+        if info.streams_of("video"):
+            raise ValueError("音频素材不应包含视频轨道")
+        audios = info.streams_of("audio")
+        if not audios or audios[0].duration is None:
+            raise ValueError(f"给定的素材文件 {path} 没有音频轨道")
+        return Probe_result("audio", audios[0].duration, 0, 0)
+
+    videos, images = info.streams_of("video"), info.streams_of("image")
+    # 有视频轨道的视为视频素材
+    if videos and videos[0].duration is not None:
+        return Probe_result("video", videos[0].duration, videos[0].width or 0, videos[0].height or 0)
+    # gif文件的时长为所有帧的总时长, 静态gif(或各帧延迟均为0)则作为图片处理
+    elif images and os.path.splitext(path)[1].lower() == ".gif" and info.duration is not None and info.duration > 0:
+        return Probe_result("video", info.duration, images[0].width or 0, images[0].height or 0)
+    elif images:
+        return Probe_result("photo", PHOTO_DURATION, images[0].width or 0, images[0].height or 0)
+    else:
+        raise ValueError(f"输入的素材文件 {path} 没有视频轨道或图片轨道")
+
+_Material = TypeVar("_Material")
+
+def _construct_all(factory: Callable[[str], _Material], paths: Sequence[str],
+                   workers: Optional[int]) -> Tuple[List[Optional[_Material]], Dict[int, Exception]]:
+    """使用线程池并发构造素材, `pymediainfo`解析文件时会释放GIL, 故线程池即可并行探测"""
+    materials: List[Optional[_Material]] = [None] * len(paths)
+    errors: Dict[int, Exception] = {}
+
+    def construct(index: int) -> None:
+        try:
+            materials[index] = factory(paths[index])
+        except Exception as e:
+            errors[index] = e
+
+    if workers == 1 or len(paths) <= 1:
+        for i in range(len(paths)):
+            construct(i)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(construct, range(len(paths))))
+    return materials, errors
 
 class Crop_settings:
     """素材的裁剪设置, 各属性均在0-1之间, 注意素材的坐标原点在左上角"""
 
+    __slots__ = ("upper_left_x", "upper_left_y", "upper_right_x", "upper_right_y",
+                 "lower_left_x", "lower_left_y", "lower_right_x", "lower_right_y")
+    __reduce_ex__ = util.slots_reduce_ex
+
     upper_left_x: float
     upper_left_y: float
     upper_right_x: float
@@ -54,65 +144,95 @@ class Video_material:
     """素材名称"""
     path: str
     """素材文件路径"""
-    duration: int
-    """素材时长, 单位为微秒"""
-    height: int
-    """素材高度"""
-    width: int
-    """素材宽度"""
     crop_settings: Crop_settings
     """素材裁剪设置"""
-    material_type: Literal["video", "photo"]
-    """素材类型: 视频或图片"""
 
-    def __init__(self, path: str, material_name: Optional[str] = None, crop_settings: Crop_settings = Crop_settings()):
+    _metadata: Optional[Probe_result]
+    """素材的类型、时长及尺寸, 延迟探测时在首次访问前为None"""
+
+    def __init__(self, path: str, material_name: Optional[str] = None, crop_settings: Crop_settings = Crop_settings(), *,
+                 lazy: bool = False, metadata: Optional[Probe_result] = None):
         """从指定位置加载视频（或图片）素材
 
         Args:
             path (`str`): 素材文件路径, 支持mp4, mov, avi等常见视频文件及jpg, jpeg, png等图片文件.
             material_name (`str`, optional): 素材名称, 如果不指定, 默认使用文件名作为素材名称.
             crop_settings (`Crop_settings`, optional): 素材裁剪设置, 默认不裁剪.
+            lazy (`bool`, optional): 是否延迟探测素材文件, 启用时仅检查文件是否存在, 在首次访问时长、尺寸或素材类型时才进行探测,
+                此时不支持的素材文件类型引发的`ValueError`也将推迟到那时抛出. 默认不延迟.
+            metadata (`Probe_result`, optional): 已知的素材元数据, 提供时不再探测素材文件.
 
         Raises:
             `FileNotFoundError`: 素材文件不存在.
-            `ValueError`: 不支持的素材文件类型.
+            `ValueError`: 不支持的素材文件类型, 或提供的元数据中素材类型不是"video"或"photo".
         """
         path = os.path.abspath(path)
-        postfix = os.path.splitext(path)[1]
         if not os.path.exists(path):
             raise FileNotFoundError(f"找不到 {path}")
+        if metadata is not None and metadata.material_type not in ("video", "photo"):
+            raise ValueError(f"视频素材的类型应为'video'或'photo', 而非'{metadata.material_type}'")
 
         self.material_name = material_name if material_name else os.path.basename(path)
-        self.material_id = uuid.uuid3(uuid.NAMESPACE_DNS, self.material_name).hex
+        self.material_id = _make_material_id(path, self.material_name)
         self.path = path
         self.crop_settings = crop_settings
         self.local_material_id = ""
 
-        if not pymediainfo.MediaInfo.can_parse():
-            raise ValueError(f"不支持的视频素材类型 '{postfix}'")
-
-        info: pymediainfo.MediaInfo = \
-            pymediainfo.MediaInfo.parse(path, mediainfo_options={"File_TestContinuousFileNames": "0"})  # type: ignore
-        # 有视频轨道的视为视频素材
-        if len(info.video_tracks):
-            self.material_type = "video"
-            self.duration = int(info.video_tracks[0].duration * 1e3)  # type: ignore
-            self.width, self.height = info.video_tracks[0].width, info.video_tracks[0].height  # type: ignore
-        # gif文件使用imageio库获取长度
-        elif postfix.lower() == ".gif":
-            import imageio
-            gif = imageio.get_reader(path)
-
-            self.material_type = "video"
-            self.duration = int(round(gif.get_meta_data()['duration'] * gif.get_length() * 1e3))
-            self.width, self.height = info.image_tracks[0].width, info.image_tracks[0].height  # type: ignore
-            gif.close()
-        elif len(info.image_tracks):
-            self.material_type = "photo"
-            self.duration = 10800000000  # 相当于3h
-            self.width, self.height = info.image_tracks[0].width, info.image_tracks[0].height  # type: ignore
-        else:
-            raise ValueError(f"输入的素材文件 {path} 没有视频轨道或图片轨道")
+        self._metadata = metadata
+        if metadata is None and not lazy:
+            self._resolve_metadata()
+
+    def _resolve_metadata(self) -> Probe_result:
+        if self._metadata is None:
+            self._metadata = probe_media(self.path, "video")
+        return self._metadata
+
+    @property
+    def duration(self) -> int:
+        """素材时长, 单位为微秒"""
+        return self._resolve_metadata().duration
+    @duration.setter
+    def duration(self, value: int):
+        self._metadata = self._resolve_metadata()._replace(duration=value)
+
+    @property
+    def width(self) -> int:
+        """素材宽度"""
+        return self._resolve_metadata().width
+    @width.setter
+    def width(self, value: int):
+        self._metadata = self._resolve_metadata()._replace(width=value)
+
+    @property
+    def height(self) -> int:
+        """素材高度"""
+        return self._resolve_metadata().height
+    @height.setter
+    def height(self, value: int):
+        self._metadata = self._resolve_metadata()._replace(height=value)
+
+    @property
+    def material_type(self) -> Literal["video", "photo"]:
+        """素材类型: 视频或图片"""
+        return self._resolve_metadata().material_type  # type: ignore
+    @material_type.setter
+    def material_type(self, value: Literal["video", "photo"]):
+        self._metadata = self._resolve_metadata()._replace(material_type=value)
+
+    @classmethod
+    def from_paths(cls, paths: Sequence[str], *, workers: Optional[int] = None,
+                   crop_settings: Crop_settings = Crop_settings()) -> Tuple[List[Optional["Video_material"]], Dict[int, Exception]]:
+        """并发加载多个视频（或图片）素材, 单个文件出错不影响其它文件
+
+        Args:
+            paths (`Sequence[str]`): 素材文件路径列表, 素材名称均使用文件名
+            workers (`int`, optional): 并发线程数, 默认由线程池自动决定, 为1时逐个加载
+            crop_settings (`Crop_settings`, optional): 所有素材的裁剪设置, 默认不裁剪
+
+        Returns:
+            (素材列表, 错误字典): 素材列表与`paths`一一对应, 加载失败的位置为None; 错误字典记录各失败位置抛出的异常
+        """
+        return _construct_all(lambda path: cls(path, crop_settings=crop_settings), paths, workers)
 
     def export_json(self) -> Dict[str, Any]:
         video_material_json = {
@@ -146,15 +266,19 @@ class Audio_material:
     path: str
     """素材文件路径"""
 
-    duration: int
-    """素材时长, 单位为微秒"""
+    _duration: Optional[int]
+    """素材时长, 延迟探测时在首次访问前为None"""
 
-    def __init__(self, path: str, material_name: Optional[str] = None):
+    def __init__(self, path: str, material_name: Optional[str] = None, *,
+                 lazy: bool = False, duration: Optional[int] = None):
         """从指定位置加载音频素材, 注意视频文件不应该作为音频素材使用
 
         Args:
             path (`str`): 素材文件路径, 支持mp3, wav等常见音频文件.
             material_name (`str`, optional): 素材名称, 如果不指定, 默认使用文件名作为素材名称.
+            lazy (`bool`, optional): 是否延迟探测素材文件, 启用时仅检查文件是否存在, 在首次访问时长时才进行探测,
+                此时不支持的素材文件类型引发的`ValueError`也将推迟到那时抛出. 默认不延迟.
+            duration (`int`, optional): 已知的素材时长, 单位为微秒, 提供时不再探测素材文件.
 
         Raises:
             `FileNotFoundError`: 素材文件不存在.
@@ -165,17 +289,36 @@ class Audio_material:
             raise FileNotFoundError(f"找不到 {path}")
 
         self.material_name = material_name if material_name else os.path.basename(path)
-        self.material_id = uuid.uuid3(uuid.NAMESPACE_DNS, self.material_name).hex
+        self.material_id = _make_material_id(path, self.material_name)
         self.path = path
 
-        if not pymediainfo.MediaInfo.can_parse():
-            raise ValueError("不支持的音频素材类型 %s" % os.path.splitext(path)[1])
-        info: pymediainfo.MediaInfo = pymediainfo.MediaInfo.parse(path)  # type: ignore
-        if len(info.video_tracks):
-            raise ValueError("音频素材不应包含视频轨道")
-        if not len(info.audio_tracks):
-            raise ValueError(f"给定的素材文件 {path} 没有音频轨道")
-        self.duration = int(info.audio_tracks[0].duration * 1e3)  # type: ignore
+        self._duration = duration
+        if duration is None and not lazy:
+            self._duration = probe_media(path, "audio").duration
+
+    @property
+    def duration(self) -> int:
+        """素材时长, 单位为微秒"""
+        if self._duration is None:
+            self._duration = probe_media(self.path, "audio").duration
+        return self._duration
+    @duration.setter
+    def duration(self, value: int):
+        self._duration = value
+
+    @classmethod
+    def from_paths(cls, paths: Sequence[str], *,
+                   workers: Optional[int] = None) -> Tuple[List[Optional["Audio_material"]], Dict[int, Exception]]:
+        """并发加载多个音频素材, 单个文件出错不影响其它文件
+
+        Args:
+            paths (`Sequence[str]`): 素材文件路径列表, 素材名称均使用文件名
+            workers (`int`, optional): 并发线程数, 默认由线程池自动决定, 为1时逐个加载
+
+        Returns:
+            (素材列表, 错误字典): 素材列表与`paths`一一对应, 加载失败的位置为None; 错误字典记录各失败位置抛出的异常
+        """
+        return _construct_all(cls, paths, workers)
 
     def export_json(self) -> Dict[str, Any]:
         return {
@@ -215,5 +358,5 @@ class Audio_material:
             "tone_type": "",
             "type": "extract_music",
             "video_id": "",
-            "wave_points": []
+            "wave_points": waveform.wave_points(self.path)
         }
@@ -0,0 +1,468 @@
+"""素材文件的统一探测服务
+
+每个文件只用`pymediainfo`完整解析一次, 得到包含时长、各条流的编码参数、尺寸及帧率的`Media_info`,
+`Video_material`、`Audio_material`及需要时长等信息的其它代码均从中获取所需数据.
+
+探测结果以(绝对路径, 文件大小, 修改时间)为键在进程内缓存, 还可以通过`set_probe_cache`启用基于SQLite的持久化缓存,
+跨进程、跨运行复用. 文件大小或修改时间变化时缓存自动失效.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from typing import Optional, NamedTuple, Generic, TypeVar
+from typing import List, Tuple, Any
+
+import pymediainfo
+
+from .image_header import read_image_header, is_image_path
+
+class Probe_result(NamedTuple):
+    """素材的类型、时长及尺寸, 即构造素材对象所需的元数据"""
+
+    material_type: str
+    """素材类型: 视频素材为video或photo, 音频素材为audio"""
+    duration: int
+    """素材时长, 单位为微秒"""
+    width: int
+    """素材宽度, 音频素材为0"""
+    height: int
+    """素材高度, 音频素材为0"""
+
+class Stream_info(NamedTuple):
+    """文件中的一条流"""
+
+    kind: str
+    """流的类型, 如video, audio, image, text等"""
+    codec: Optional[str]
+    """编码格式, 如AVC, AAC, GIF等"""
+    duration: Optional[int]
+    """流的时长, 单位为微秒"""
+    width: Optional[int]
+    height: Optional[int]
+    fps: Optional[float]
+    """帧率, 音频流为音频帧的帧率"""
+    sample_rate: Optional[int]
+    """采样率, 仅音频流有效"""
+    channels: Optional[int]
+    """声道数, 仅音频流有效"""
+    bit_rate: Optional[int]
+
+class Media_info(NamedTuple):
+    """一个文件的完整探测结果"""
+
+    container: Optional[str]
+    """容器格式, 如MPEG-4, GIF等"""
+    duration: Optional[int]
+    """文件时长, 单位为微秒. 对于gif文件为各帧延迟之和"""
+    streams: Tuple[Stream_info, ...]
+    """文件中的所有流"""
+
+    def streams_of(self, kind: str) -> List[Stream_info]:
+        """获取指定类型的所有流"""
+        return [stream for stream in self.streams if stream.kind == kind]
+
+    @property
+    def width(self) -> Optional[int]:
+        """首个视频(或图片)流的宽度"""
+        stream = self._first_visual_stream()
+        return stream.width if stream else None
+
+    @property
+    def height(self) -> Optional[int]:
+        """首个视频(或图片)流的高度"""
+        stream = self._first_visual_stream()
+        return stream.height if stream else None
+
+    @property
+    def fps(self) -> Optional[float]:
+        """首个视频流的帧率"""
+        videos = self.streams_of("video")
+        return videos[0].fps if videos else None
+
+    def _first_visual_stream(self) -> Optional[Stream_info]:
+        visual = self.streams_of("video") or self.streams_of("image")
+        return visual[0] if visual else None
+
+    def to_json(self) -> str:
+        return json.dumps([self.container, self.duration, [list(stream) for stream in self.streams]])
+
+    @staticmethod
+    def from_json(data: str) -> "Media_info":
+        container, duration, streams = json.loads(data)
+        return Media_info(container, duration, tuple(Stream_info(*stream) for stream in streams))
+
+def _to_int(value: object) -> Optional[int]:
+    try:
+        return int(float(value))  # type: ignore
+    except (TypeError, ValueError):
+        return None
+
+def _to_float(value: object) -> Optional[float]:
+    try:
+        return float(value)  # type: ignore
+    except (TypeError, ValueError):
+        return None
+
+def _to_us(ms: object) -> Optional[int]:
+    """将MediaInfo给出的毫秒数转换为微秒"""
+    value = _to_float(ms)
+    return int(value * 1e3) if value is not None else None
+
+def _parse_media_info(path: str) -> Media_info:
+    """解析文件, 图片文件优先只解析文件头, 其它文件或文件头解析失败时使用`pymediainfo`完整解析
+
+    Raises:
+        `ValueError`: 当前环境无法使用MediaInfo
+    """
+    if is_image_path(path):
+        header = read_image_header(path)
+        if header is not None:
+            stream = Stream_info("image", header.format, None, header.width, header.height, None, None, None, None)
+            return Media_info(header.format, header.duration, (stream,))
+
+    if not pymediainfo.MediaInfo.can_parse():
+        raise ValueError(f"无法解析素材文件 '{os.path.splitext(path)[1]}', 未找到MediaInfo库")
+
+    # 以文件对象的形式传入, 使MediaInfo不会将名称连续的图片识别为图片序列.
+    # 不使用mediainfo_options关闭此功能, 因为解析后重置选项的操作在多线程下并不安全
+    with open(path, "rb") as f:
+        info: pymediainfo.MediaInfo = pymediainfo.MediaInfo.parse(f)  # type: ignore
+
+    streams: List[Stream_info] = []
+    for track in info.tracks:
+        if track.track_type == "General":
+            continue
+        streams.append(Stream_info(
+            track.track_type.lower(), track.format, _to_us(track.duration),
+            _to_int(track.width), _to_int(track.height), _to_float(track.frame_rate),
+            _to_int(track.sampling_rate), _to_int(track.channel_s), _to_int(track.bit_rate)
+        ))
+
+    general = info.general_tracks[0] if info.general_tracks else None
+    container = general.format if general else None
+    duration = _to_us(general.duration) if general else None
+    # 无法解析文件头的gif文件使用imageio库获取长度
+    if not info.video_tracks and os.path.splitext(path)[1].lower() == ".gif":
+        import imageio
+        gif = imageio.get_reader(path)
+        duration = int(round(gif.get_meta_data()['duration'] * gif.get_length() * 1e3))
+        gif.close()
+
+    return Media_info(container, duration, tuple(streams))
+
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+class _Lru_memo(Generic[_K, _V]):
+    """线程安全的进程内LRU缓存"""
+
+    size: int
+    _items: "OrderedDict[_K, _V]"
+    _lock: threading.Lock
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: _K) -> Optional[_V]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: _K, value: _V) -> None:
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+class Probe_cache:
+    """基于SQLite的探测结果缓存, 可在多个线程及进程间共享同一数据库文件"""
+
+    SCHEMA_VERSION = 2
+    """数据库结构版本, 结构变化时递增, 旧版本的数据将被丢弃"""
+
+    db_path: str
+    """数据库文件路径"""
+
+    _conn: sqlite3.Connection
+    _lock: threading.Lock
+    _stored: _Lru_memo[Tuple[str, Tuple[Any, ...]], bool]
+    """(表名, 主键) -> 本进程已确认数据库中存有相应的最新结果, 使进程内缓存命中时无需重复写入"""
+
+    def __init__(self, db_path: str):
+        """打开(或创建)指定路径的缓存数据库
+
+        Args:
+            db_path (`str`): 数据库文件路径, 所在文件夹不存在时将自动创建
+        """
+        self.db_path = os.path.abspath(db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stored = _Lru_memo(STORED_MEMO_SIZE)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS probe")
+                self._conn.execute("DROP TABLE IF EXISTS media_info")
+                self._conn.execute("PRAGMA user_version = %d" % self.SCHEMA_VERSION)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS media_info ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprint ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS waveform ("
+                "digest TEXT NOT NULL, resolution INTEGER NOT NULL, data BLOB NOT NULL, PRIMARY KEY (digest, resolution))"
+            )
+
+    @staticmethod
+    def file_key(path: str) -> Tuple[str, int, int]:
+        """获取文件的缓存键: (绝对路径, 文件大小, 修改时间)"""
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def get(self, path: str) -> Optional[Media_info]:
+        """查询文件的探测结果, 未缓存或文件已变化时返回None"""
+        return self._get(self.file_key(path))
+
+    def _get(self, file_key: Tuple[str, int, int]) -> Optional[Media_info]:
+        abs_path, size, mtime_ns = file_key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, data FROM media_info WHERE path = ?", (abs_path,)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        try:
+            info = Media_info.from_json(row[2])
+        except (ValueError, TypeError):
+            return None
+        self._stored.put(("media_info", file_key), True)
+        return info
+
+    def put(self, path: str, info: Media_info, file_key: Optional[Tuple[str, int, int]] = None) -> bool:
+        """写入文件的探测结果, 数据库中已有该文件(大小及修改时间相同)的结果时不做修改
+
+        Args:
+            path (`str`): 素材文件路径
+            info (`Media_info`): 探测结果
+            file_key (`Tuple[str, int, int]`, optional): 探测*之前*获取的(绝对路径, 文件大小, 修改时间), 默认在写入时获取.
+                提供此项可避免探测期间文件被修改时写入过期的结果
+
+        Returns:
+            是否实际写入了数据库
+        """
+        if file_key is None:
+            file_key = self.file_key(path)
+        written = self._upsert("media_info", "data", file_key, info.to_json())
+        self._stored.put(("media_info", file_key), True)
+        return written
+
+    def _upsert(self, table: str, column: str, file_key: Tuple[str, int, int], value: str) -> bool:
+        """写入以文件为键的一行数据, 已有大小及修改时间相同的行时不做修改, 返回是否实际写入"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO %s VALUES (?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET "
+                "size = excluded.size, mtime_ns = excluded.mtime_ns, %s = excluded.%s "
+                "WHERE size != excluded.size OR mtime_ns != excluded.mtime_ns" % (table, column, column),
+                file_key + (value,)
+            )
+            return cursor.rowcount > 0
+
+    def _is_stored(self, table: str, key: Tuple[Any, ...]) -> bool:
+        """本进程是否已确认数据库中存有相应的最新结果"""
+        return self._stored.get((table, key)) is not None
+
+    def _get_fingerprint(self, file_key: Tuple[str, int, int]) -> Optional[str]:
+        abs_path, size, mtime_ns = file_key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, digest FROM fingerprint WHERE path = ?", (abs_path,)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        self._stored.put(("fingerprint", file_key), True)
+        return row[2]
+
+    def _put_fingerprint(self, file_key: Tuple[str, int, int], digest: str) -> None:
+        self._upsert("fingerprint", "digest", file_key, digest)
+        self._stored.put(("fingerprint", file_key), True)
+
+    def _get_waveform(self, digest: str, resolution: int) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM waveform WHERE digest = ? AND resolution = ?", (digest, resolution)
+            ).fetchone()
+        if row is None:
+            return None
+        self._stored.put(("waveform", (digest, resolution)), True)
+        return row[0]
+
+    def _put_waveform(self, digest: str, resolution: int, data: bytes) -> None:
+        # 内容指纹相同的文件波形也相同, 已有的数据无需覆盖
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO waveform VALUES (?, ?, ?)", (digest, resolution, data))
+        self._stored.put(("waveform", (digest, resolution)), True)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM media_info")
+            self._conn.execute("DELETE FROM fingerprint")
+            self._conn.execute("DELETE FROM waveform")
+        self._stored.clear()
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def warm(self, directory: str, *, recursive: bool = True) -> int:
+        """预先探测文件夹中的所有文件并写入缓存, 已缓存且未变化的文件将被跳过, 无法解析的文件将被忽略.
+        已在进程内缓存中的结果直接写入, 不会重新解析
+
+        Args:
+            directory (`str`): 素材文件夹
+            recursive (`bool`, optional): 是否包含子文件夹中的文件, 默认为True
+
+        Returns:
+            实际写入缓存的文件数
+        """
+        count = 0
+        for path in _list_files(directory, recursive):
+            try:
+                key = self.file_key(path)
+                if self._get(key) is not None:
+                    continue
+                info = _memo.get(key)
+                if info is None:
+                    info = _parse_media_info(path)
+                    _memo.put(key, info)
+            except (ValueError, OSError, RuntimeError):
+                continue
+            if self.put(path, info, key):
+                count += 1
+        return count
+
+def _list_files(directory: str, recursive: bool) -> List[str]:
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"文件夹 {directory} 不存在")
+    if not recursive:
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if os.path.isfile(os.path.join(directory, name))]
+    ret: List[str] = []
+    for root, _, files in os.walk(directory):
+        ret.extend(os.path.join(root, name) for name in sorted(files))
+    return ret
+
+_active_cache: Optional[Probe_cache] = None
+"""当前启用的全局持久化缓存"""
+
+def set_probe_cache(cache: Optional[Probe_cache]) -> Optional[Probe_cache]:
+    """设置全局使用的持久化探测缓存, 传入None以禁用, 返回此前的缓存"""
+    global _active_cache
+    previous, _active_cache = _active_cache, cache
+    return previous
+
+def get_probe_cache() -> Optional[Probe_cache]:
+    """获取当前启用的全局持久化探测缓存, 未启用时返回None"""
+    return _active_cache
+
+MEMO_SIZE = 1024
+"""进程内缓存的探测结果(及内容指纹)数量上限, 超出时淘汰最久未使用的结果"""
+STORED_MEMO_SIZE = 4 * MEMO_SIZE
+"""每个持久化缓存记录的"已写入"文件键数量上限, 被淘汰的文件键在下次命中进程内缓存时会再写入一次"""
+_memo: _Lru_memo[Tuple[str, int, int], Media_info] = _Lru_memo(MEMO_SIZE)
+_fingerprint_memo: _Lru_memo[Tuple[str, int, int], str] = _Lru_memo(MEMO_SIZE)
+
+def probe_file(path: str, cache: Optional[Probe_cache] = None) -> Media_info:
+    """探测文件的时长、各条流的参数、尺寸及帧率, 依次查询进程内缓存、持久化缓存, 均未命中时才解析文件
+
+    启用了持久化缓存时, 在其启用之前探测并存于进程内缓存的结果也会写入持久化缓存
+
+    Args:
+        path (`str`): 文件路径
+        cache (`Probe_cache`, optional): 使用的持久化缓存, 默认使用`set_probe_cache`设置的全局缓存
+
+    Raises:
+        `FileNotFoundError`: 文件不存在
+        `ValueError`: 当前环境无法使用MediaInfo
+    """
+    key = Probe_cache.file_key(path)
+    if cache is None:
+        cache = get_probe_cache()
+    info = _memo.get(key)
+    if info is not None:
+        if cache is not None and not cache._is_stored("media_info", key):
+            cache.put(path, info, key)
+        return info
+
+    info = cache._get(key) if cache is not None else None
+    if info is None:
+        info = _parse_media_info(path)
+        if cache is not None:
+            cache.put(path, info, key)
+
+    _memo.put(key, info)
+    return info
+
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+"""计算内容指纹时在文件开头、中间及结尾各读取的字节数"""
+
+def _compute_fingerprint(path: str, size: int) -> str:
+    hasher = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+    with open(path, "rb") as f:
+        if size <= 3 * FINGERPRINT_BLOCK_SIZE:
+            hasher.update(f.read())
+        else:
+            for offset in (0, (size - FINGERPRINT_BLOCK_SIZE) // 2, size - FINGERPRINT_BLOCK_SIZE):
+                f.seek(offset)
+                hasher.update(f.read(FINGERPRINT_BLOCK_SIZE))
+    return hasher.hexdigest()
+
+def file_fingerprint(path: str, cache: Optional[Probe_cache] = None) -> str:
+    """计算文件的抽样内容指纹, 即文件大小与开头、中间、结尾各一块数据的哈希值, 格式为32位十六进制字符串
+
+    不读取整个文件, 因而大文件的耗时也很短; 较小的文件则对全部内容计算哈希.
+    结果与探测结果一样在进程内及持久化缓存中以(绝对路径, 文件大小, 修改时间)为键缓存.
+
+    Args:
+        path (`str`): 文件路径
+        cache (`Probe_cache`, optional): 使用的持久化缓存, 默认使用`set_probe_cache`设置的全局缓存
+
+    Raises:
+        `FileNotFoundError`: 文件不存在
+    """
+    key = Probe_cache.file_key(path)
+    if cache is None:
+        cache = get_probe_cache()
+    digest = _fingerprint_memo.get(key)
+    if digest is not None:
+        if cache is not None and not cache._is_stored("fingerprint", key):
+            cache._put_fingerprint(key, digest)
+        return digest
+
+    digest = cache._get_fingerprint(key) if cache is not None else None
+    if digest is None:
+        digest = _compute_fingerprint(path, key[1])
+        if cache is not None:
+            cache._put_fingerprint(key, digest)
+
+    _fingerprint_memo.put(key, digest)
+    return digest
@@ -0,0 +1,5 @@
+"""素材探测结果的持久化缓存, 现已并入`media_probe`, 保留此模块以兼容原有的导入路径"""
+
+from .media_probe import Probe_cache, set_probe_cache, get_probe_cache
+
+__all__ = ["Probe_cache", "set_probe_cache", "get_probe_cache"]
@@ -1,10 +1,13 @@
 import os
 import json
 import math
-from copy import deepcopy
+import uuid
+import marshal
+import hashlib
+from copy import copy, deepcopy
 
 from typing import Optional, Literal, Union, overload
-from typing import Type, Dict, List, Any
+from typing import Type, ClassVar, Dict, List, Tuple, Sequence, Iterator, Any
 
 from . import util
 from . import exceptions
@@ -17,6 +20,9 @@ from .video_segment import Video_segment, Sticker_segment, Segment_animations, V
 from .effect_segment import Effect_segment, Filter_segment
 from .text_segment import Text_segment, Text_style, TextBubble
 from .track import Track_type, Base_track, Track
+from .export_cache import Export_cache
+from .timeline_index import Timeline_index, Timeline_item
+from .draft_snapshot import load_draft_content
 
 from .metadata import Video_scene_effect_type, Video_character_effect_type, Filter_type
 
@@ -50,6 +56,21 @@ class Script_material:
     filters: List[Union[Filter, TextBubble]]
     """滤镜/文本花字/文本气泡列表, 导出到`effects`中"""
 
+    _INDEXED_LISTS: ClassVar[Dict[str, str]] = {
+        "videos": "material_id",
+        "audios": "material_id",
+        "audio_fades": "fade_id",
+        "audio_effects": "effect_id",
+        "animations": "animation_id",
+        "video_effects": "global_id",
+        "transitions": "global_id",
+        "filters": "global_id",
+    }
+    """建立ID索引的素材列表, 键为列表名称, 值为元素的ID属性名"""
+
+    _indexes: Dict[str, Tuple[List[Any], int, Dict[str, Any]]]
+    """各素材列表的ID索引, 值为(建立索引时的列表对象, 已索引的元素个数, ID到素材的映射)"""
+
     def __init__(self):
         self.audios = []
         self.videos = []
@@ -66,6 +87,38 @@ class Script_material:
         self.transitions = []
         self.filters = []
 
+        self._indexes = {}
+
+    def get_index(self, list_name: str) -> Dict[str, Any]:
+        """获取指定素材列表的ID索引(ID到素材对象的映射), 不应修改返回的字典
+
+        索引随列表的追加操作增量更新, 因此可以直接向列表中`append`素材;
+        若列表被整体替换或已索引的部分发生了变化(如移除了元素), 则会重建索引
+        """
+        material_list: List[Any] = getattr(self, list_name)
+        id_attr = self._INDEXED_LISTS[list_name]
+
+        cached = self._indexes.get(list_name)
+        if cached is not None and cached[0] is material_list and self._index_valid(material_list, cached[1], cached[2], id_attr):
+            indexed_count, index = cached[1], cached[2]
+        else:
+            indexed_count, index = 0, {}
+
+        for material in material_list[indexed_count:]:
+            index[getattr(material, id_attr)] = material
+        self._indexes[list_name] = (material_list, len(material_list), index)
+        return index
+
+    @staticmethod
+    def _index_valid(material_list: List[Any], indexed_count: int, index: Dict[str, Any], id_attr: str) -> bool:
+        """粗略检查已索引的部分是否未被修改: 长度未减少, 且最后一个已索引的元素仍在原位"""
+        if indexed_count > len(material_list):
+            return False
+        if indexed_count == 0:
+            return True
+        last = material_list[indexed_count - 1]
+        return index.get(getattr(last, id_attr)) is last
+
     @overload
     def __contains__(self, item: Union[Video_material, Audio_material]) -> bool: ...
     @overload
@@ -75,21 +128,21 @@ class Script_material:
 
     def __contains__(self, item) -> bool:
         if isinstance(item, Video_material):
-            return item.material_id in [video.material_id for video in self.videos]
+            return item.material_id in self.get_index("videos")
         elif isinstance(item, Audio_material):
-            return item.material_id in [audio.material_id for audio in self.audios]
+            return item.material_id in self.get_index("audios")
         elif isinstance(item, Audio_fade):
-            return item.fade_id in [fade.fade_id for fade in self.audio_fades]
+            return item.fade_id in self.get_index("audio_fades")
         elif isinstance(item, Audio_effect):
-            return item.effect_id in [effect.effect_id for effect in self.audio_effects]
+            return item.effect_id in self.get_index("audio_effects")
         elif isinstance(item, Segment_animations):
-            return item.animation_id in [ani.animation_id for ani in self.animations]
+            return item.animation_id in self.get_index("animations")
         elif isinstance(item, Video_effect):
-            return item.global_id in [effect.global_id for effect in self.video_effects]
+            return item.global_id in self.get_index("video_effects")
         elif isinstance(item, Transition):
-            return item.global_id in [transition.global_id for transition in self.transitions]
+            return item.global_id in self.get_index("transitions")
         elif isinstance(item, Filter):
-            return item.global_id in [filter_.global_id for filter_ in self.filters]
+            return item.global_id in self.get_index("filters")
         else:
             raise TypeError("Invalid argument type '%s'" % type(item))
 
@@ -165,10 +218,24 @@ class Script_file:
     """轨道信息"""
 
     imported_materials: Dict[str, List[Dict[str, Any]]]
-    """导入的素材信息"""
+    """导入的素材信息, 其中的素材与`content["materials"]`共享, 修改前需先复制(写时复制)"""
     imported_tracks: List[Imported_track]
     """导入的轨道信息"""
 
+    _track_index: Dict[Any, List[Track]]
+    """按接受的片段类型索引的轨道列表"""
+    _track_index_source: Optional[Dict[str, Track]]
+    """建立`_track_index`时的`tracks`字典对象"""
+    _track_index_count: int
+    """`_track_index`中已索引的轨道数"""
+
+    _export_cache: Export_cache
+    """导出时使用的JSON片段缓存"""
+    _timeline_index: Timeline_index
+    """跨轨道的时间范围查询索引"""
+    _last_written: Optional[Tuple[str, int, int, bytes]]
+    """最近一次写入的文件信息: (绝对路径, 修改时间, 文件大小, 内容摘要), 用于判断内容是否变化"""
+
     TEMPLATE_FILE = "draft_content_template.json"
 
     def __init__(self, width: int, height: int, fps: int = 30):
@@ -189,37 +256,82 @@ class Script_file:
         self.materials = Script_material()
         self.tracks = {}
 
+        self._track_index = {}
+        self._track_index_source = self.tracks
+        self._track_index_count = 0
+
         self.imported_materials = {}
         self.imported_tracks = []
 
+        self._export_cache = Export_cache()
+        self._timeline_index = Timeline_index()
+        self._last_written = None
+
         with open(os.path.join(os.path.dirname(__file__), self.TEMPLATE_FILE), "r", encoding="utf-8") as f:
             self.content = json.load(f)
 
     @staticmethod
-    def load_template(json_path: str) -> "Script_file":
+    def load_template(json_path: str, *, use_snapshot: bool = False, snapshot_dir: Optional[str] = None) -> "Script_file":
         """从JSON文件加载草稿模板
 
         Args:
             json_path (str): JSON文件路径
+            use_snapshot (bool, optional): 是否使用二进制快照跳过JSON解析, 快照在JSON文件的修改时间或大小变化时自动失效. 默认不使用.
+            snapshot_dir (str, optional): 存放快照的文件夹, 默认位于用户的缓存目录下.
 
         Raises:
             `FileNotFoundError`: JSON文件不存在
         """
+        content = load_draft_content(json_path, use_snapshot=use_snapshot, snapshot_dir=snapshot_dir)
+        return Script_file._from_template_content(json_path, content)
+
+    @staticmethod
+    def _from_template_content(json_path: str, content: Dict[str, Any]) -> "Script_file":
+        """根据已解析的草稿内容构造模板模式下的草稿对象
+
+        `content`本身不会被修改, 因此多个草稿对象可以共享同一份解析结果
+
+        Args:
+            json_path (str): 草稿的保存路径
+            content (Dict[str, Any]): 已解析的草稿内容
+        """
         obj = Script_file(**util.provide_ctor_defaults(Script_file))
         obj.save_path = json_path
-        if not os.path.exists(json_path):
-            raise FileNotFoundError("JSON文件 '%s' 不存在" % json_path)
-        with open(json_path, "r", encoding="utf-8") as f:
-            obj.content = json.load(f)
+        obj.content = dict(content)
 
         util.assign_attr_with_json(obj, ["fps", "duration"], obj.content)
         util.assign_attr_with_json(obj, ["width", "height"], obj.content["canvas_config"])
 
-        obj.imported_materials = deepcopy(obj.content["materials"])
+        # 素材及轨道均与解析出的数据共享, 仅在修改时复制相应部分
+        obj.imported_materials = {material_type: copy(material_list)
+                                  for material_type, material_list in obj.content["materials"].items()}
         obj.imported_tracks = [import_track(track_data) for track_data in obj.content["tracks"]]
 
         return obj
 
+    def fork(self) -> "Script_file":
+        """创建当前草稿的一份独立可编辑的快照, 适合基于同一模板批量生成大量变体
+
+        导入轨道及其片段的原始数据(`raw_data`, 本就不应被修改)在快照间共享, 仅在修改时复制(写时复制), 因此代价远低于重新加载模板;
+        `content`(导出时会被覆盖的`materials`及`tracks`除外)及`imported_materials`通过`marshal`完整复制, 新建的轨道及素材也会被完整复制.
+        因此对快照的编辑, 包括直接修改其中的嵌套数据, 都不会影响当前草稿, 反之亦然.
+        """
+        obj = copy(self)
+
+        # `content`中的素材及轨道在导出时会被替换, 无需复制
+        own_content = {key: value for key, value in self.content.items() if key not in ("materials", "tracks")}
+        own_content, obj.imported_materials = marshal.loads(marshal.dumps((own_content, self.imported_materials)))
+        obj.content = {key: own_content[key] if key in own_content else value for key, value in self.content.items()}
+
+        # 新建轨道中的片段与素材列表引用同一批对象, 需一并复制以保持引用关系
+        obj.materials, obj.tracks = deepcopy((self.materials, self.tracks))
+
+        obj.imported_tracks = [track.fork() for track in self.imported_tracks]
+
+        obj._export_cache = self._export_cache.fork()
+        obj._timeline_index = Timeline_index()
+        return obj
+
     def add_material(self, material: Union[Video_material, Audio_material]) -> "Script_file":
         """向草稿文件中添加一个素材"""
         if material in self.materials:  # 素材已存在
@@ -232,6 +344,16 @@ class Script_file:
             raise TypeError("错误的素材类型: '%s'" % type(material))
         return self
 
+    def _writable_imported_material(self, material_type: str, index: int) -> Dict[str, Any]:
+        """将指定的导入素材替换为其副本并返回, 以免修改影响到共享的模板数据"""
+        material_list = self.imported_materials[material_type]
+        material_list[index] = copy(material_list[index])
+        return material_list[index]
+
+    def _mark_track_dirty(self, track: Base_track) -> None:
+        """标记轨道已发生变化, 使其时间范围索引失效"""
+        self._timeline_index.invalidate(track)
+
     def add_track(self, track_type: Track_type, track_name: Optional[str] = None, *,
                   mute: bool = False,
                   relative_index: int = 0, absolute_index: Optional[int] = None) -> "Script_file":
@@ -254,19 +376,37 @@ class Script_file:
         """
 
         if track_name is None:
-            if track_type in [track.track_type for track in self.tracks.values()]:
+            same_type_tracks = self._tracks_accepting(track_type.value.segment_type)
+            if any(track.track_type == track_type for track in same_type_tracks):
                 raise NameError("'%s' 类型的轨道已存在, 请为新轨道指定名称以避免混淆" % track_type)
             track_name = track_type.name
-        if track_name in [track.name for track in self.tracks.values()]:
+        if track_name in self.tracks:
             raise NameError("名为 '%s' 的轨道已存在" % track_name)
 
         render_index = track_type.value.render_index + relative_index
         if absolute_index is not None:
             render_index = absolute_index
 
-        self.tracks[track_name] = Track(track_type, track_name, render_index, mute)
+        track: Track = Track(track_type, track_name, render_index, mute)
+        self._tracks_accepting(track.accept_segment_type)  # 确保索引与添加前的轨道一致
+        self.tracks[track_name] = track
+        self._track_index.setdefault(track.accept_segment_type, []).append(track)
+        self._track_index_count += 1
         return self
 
+    def _tracks_accepting(self, segment_type: Any) -> List[Track]:
+        """获取接受指定类型片段的所有轨道
+
+        结果来自按片段类型建立的索引, 若`tracks`被整体替换或不经`add_track`增删了轨道, 则重建索引
+        """
+        if self._track_index_source is not self.tracks or self._track_index_count != len(self.tracks):
+            self._track_index = {}
+            for track in self.tracks.values():
+                self._track_index.setdefault(track.accept_segment_type, []).append(track)
+            self._track_index_source = self.tracks
+            self._track_index_count = len(self.tracks)
+        return self._track_index.get(segment_type, [])
+
     def _get_track(self, segment_type: Type[Base_segment], track_name: Optional[str]) -> Track:
         # 指定轨道名称
         if track_name is not None:
@@ -274,11 +414,11 @@ class Script_file:
                 raise NameError("不存在名为 '%s' 的轨道" % track_name)
             return self.tracks[track_name]
         # 寻找唯一的同类型的轨道
-        count = sum([1 for track in self.tracks.values() if track.accept_segment_type == segment_type])
-        if count == 0: raise NameError("不存在接受 '%s' 的轨道" % segment_type)
-        if count > 1: raise NameError("存在多个接受 '%s' 的轨道, 请指定轨道名称" % segment_type)
+        candidates = self._tracks_accepting(segment_type)
+        if len(candidates) == 0: raise NameError("不存在接受 '%s' 的轨道" % segment_type)
+        if len(candidates) > 1: raise NameError("存在多个接受 '%s' 的轨道, 请指定轨道名称" % segment_type)
 
-        return next(track for track in self.tracks.values() if track.accept_segment_type == segment_type)
+        return candidates[0]
 
     def add_segment(self, segment: Union[Video_segment, Sticker_segment, Audio_segment, Text_segment],
                     track_name: Optional[str] = None) -> "Script_file":
@@ -298,8 +438,45 @@ class Script_file:
         # 加入轨道并更新时长
         target.add_segment(segment)
         self.duration = max(self.duration, segment.end)
+        self._mark_track_dirty(target)
 
         # 自动添加相关素材
+        self._add_segment_materials(segment)
+        return self
+
+    def add_segments(self, segments: Sequence[Union[Video_segment, Sticker_segment, Audio_segment, Text_segment]],
+                     track_name: Optional[str] = None) -> "Script_file":
+        """向指定轨道中批量添加片段, 效果与依次调用`add_segment`相同, 但速度快得多
+
+        轨道只解析一次, 重叠检查在片段排序后一次完成, 时长与导出缓存也只更新一次.
+        片段在轨道中的顺序与传入顺序一致; 若有任何片段不满足要求, 则不会添加任何片段.
+
+        Args:
+            segments (`Sequence[Video_segment]`, `Sequence[Sticker_segment]`, `Sequence[Audio_segment]`, or `Sequence[Text_segment]`):
+                要添加的片段, 必须为同一类型
+            track_name (`str`, optional): 添加到的轨道名称. 当此类型的轨道仅有一条时可省略.
+
+        Raises:
+            `NameError`: 未找到指定名称的轨道, 或必须提供`track_name`参数时未提供
+            `TypeError`: 片段类型不匹配轨道类型
+            `SegmentOverlap`: 新片段与已有片段或其他新片段重叠
+        """
+        if len(segments) == 0:
+            return self
+        target = self._get_track(type(segments[0]), track_name)
+
+        # 加入轨道并更新时长
+        target.add_segments(segments)
+        self.duration = max(self.duration, max(segment.end for segment in segments))
+        self._mark_track_dirty(target)
+
+        # 自动添加相关素材
+        for segment in segments:
+            self._add_segment_materials(segment)
+        return self
+
+    def _add_segment_materials(self, segment: Base_segment) -> None:
+        """添加片段所需的相关素材"""
         if isinstance(segment, Video_segment):
             # 出入场等动画
             if (segment.animations_instance is not None) and (segment.animations_instance not in self.materials):
@@ -320,6 +497,7 @@ class Script_file:
                 self.materials.transitions.append(segment.transition)
 
             self.materials.speeds.append(segment.speed)
+            self.add_material(segment.material_instance)
         elif isinstance(segment, Sticker_segment):
             self.materials.stickers.append(segment.export_material())
         elif isinstance(segment, Audio_segment):
@@ -331,6 +509,7 @@ class Script_file:
                 if effect not in self.materials:
                     self.materials.audio_effects.append(effect)
             self.materials.speeds.append(segment.speed)
+            self.add_material(segment.material_instance)
         elif isinstance(segment, Text_segment):
             # 出入场等动画
             if (segment.animations_instance is not None) and (segment.animations_instance not in self.materials):
@@ -344,12 +523,6 @@ class Script_file:
             # 字体样式
             self.materials.texts.append(segment.export_material())
 
-        # 添加片段素材
-        if isinstance(segment, (Video_segment, Audio_segment)):
-            self.add_material(segment.material_instance)
-
-        return self
-
     def add_effect(self, effect: Union[Video_scene_effect_type, Video_character_effect_type],
                    t_range: Timerange, track_name: Optional[str] = None, *,
                    params: Optional[List[Optional[float]]] = None) -> "Script_file":
@@ -373,6 +546,7 @@ class Script_file:
         segment = Effect_segment(effect, t_range, params)
         target.add_segment(segment)
         self.duration = max(self.duration, t_range.start + t_range.duration)
+        self._mark_track_dirty(target)
 
         # 自动添加相关素材
         if segment.effect_inst not in self.materials:
@@ -400,6 +574,7 @@ class Script_file:
         segment = Filter_segment(filter_meta, t_range, intensity / 100.0)  # 转换为0-1范围
         target.add_segment(segment)
         self.duration = max(self.duration, t_range.end)
+        self._mark_track_dirty(target)
 
         # 自动添加相关素材
         self.materials.filters.append(segment.material)
@@ -537,19 +712,20 @@ class Script_file:
         """
         video_mode = isinstance(material, Video_material)
         # 查找素材
-        target_json_obj: Optional[Dict[str, Any]] = None
+        target_index: Optional[int] = None
         target_material_list = self.imported_materials["videos" if video_mode else "audios"]
         name_key = "material_name" if video_mode else "name"
-        for mat in target_material_list:
+        for index, mat in enumerate(target_material_list):
             if mat[name_key] == material_name:
-                if target_json_obj is not None:
+                if target_index is not None:
                     raise exceptions.AmbiguousMaterial(
                         "找到多个名为 '%s', 类型为 '%s' 的素材" % (material_name, type(material)))
-                target_json_obj = mat
-        if target_json_obj is None:
+                target_index = index
+        if target_index is None:
             raise exceptions.MaterialNotFound("没有找到名为 '%s', 类型为 '%s' 的素材" % (material_name, type(material)))
 
         # 更新素材信息
+        target_json_obj = self._writable_imported_material("videos" if video_mode else "audios", target_index)
         target_json_obj.update({name_key: material.material_name, "path": material.path, "duration": material.duration})
         if video_mode:
             target_json_obj.update({"width": material.width, "height": material.height, "material_type": material.material_type})
@@ -583,8 +759,8 @@ class Script_file:
         if not 0 <= segment_index < len(track):
             raise IndexError("片段下标 %d 超出 [0, %d) 的范围" % (segment_index, len(track)))
         if not track.check_material_type(material):
-            raise TypeError("指定的素材类型 %s 不匹配轨道类型 %s", (type(material), track.track_type))
-        seg = track.segments[segment_index]
+            raise TypeError("指定的素材类型 %s 不匹配轨道类型 %s" % (type(material), track.track_type))
+        seg = track.get_segment(segment_index)
 
         if isinstance(handle_extend, Extend_mode):
             handle_extend = [handle_extend]
@@ -598,12 +774,66 @@ class Script_file:
         track.process_timerange(segment_index, source_timerange, handle_shrink, handle_extend)
 
         # 最后替换素材链接
-        track.segments[segment_index].material_id = material.material_id
+        seg.material_id = material.material_id
+        self._mark_track_dirty(track)
         self.add_material(material)
 
         # TODO: 更新总长
         return self
 
+    def replace_materials_on_track(self, track: Editable_track, materials: Sequence[Union[Video_material, Audio_material]],
+                                   source_timeranges: Optional[Sequence[Optional[Timerange]]] = None, *,
+                                   handle_shrink: Shrink_mode = Shrink_mode.cut_tail,
+                                   handle_extend: Union[Extend_mode, List[Extend_mode]] = Extend_mode.cut_material_tail) -> "Script_file":
+        """依次替换指定音视频轨道上前`len(materials)`个片段的素材, 结果与逐个调用`replace_material_by_seg`相同
+
+        所有参数在替换前统一检查, 各片段的时间范围变更及后续片段的偏移在一次遍历中完成, 适合替换整条轨道
+
+        Args:
+            track (`Editable_track`): 要替换素材的轨道, 由`get_imported_track`获取
+            materials (`Sequence[Video_material]` or `Sequence[Audio_material]`): 新素材列表, 第i个素材用于替换第i个片段
+            source_timeranges (`Sequence[Optional[Timerange]]`, optional): 与`materials`一一对应的截取范围, 含义同`replace_material_by_seg`,
+                为None或其中某项为None时使用默认值
+            handle_shrink (`Shrink_mode`, optional): 新素材比原素材短时的处理方式, 默认为裁剪尾部, 使片段长度与素材一致.
+            handle_extend (`Extend_mode` or `List[Extend_mode]`, optional): 新素材比原素材长时的处理方式, 将按顺序逐个尝试直至成功或抛出异常.
+                默认为截断素材尾部, 使片段维持原长不变
+
+        Raises:
+            `IndexError`: 素材数量超过了轨道的片段数
+            `ValueError`: `source_timeranges`与`materials`长度不一致
+            `TypeError`: 轨道或素材类型不正确
+            `ExtensionFailed`: 新素材比原素材长时处理失败, 此时之前的片段已完成替换
+        """
+        if not isinstance(track, Imported_media_track):
+            raise TypeError("指定的轨道(类型为 %s)不支持素材替换" % track.track_type)
+        if len(materials) > len(track):
+            raise IndexError("素材数量 %d 超过了轨道的片段数 %d" % (len(materials), len(track)))
+        if source_timeranges is not None and len(source_timeranges) != len(materials):
+            raise ValueError("source_timeranges的长度 (%d) 与素材数量 (%d) 不一致" % (len(source_timeranges), len(materials)))
+        for material in materials:
+            if not track.check_material_type(material):
+                raise TypeError("指定的素材类型 %s 不匹配轨道类型 %s" % (type(material), track.track_type))
+
+        if isinstance(handle_extend, Extend_mode):
+            handle_extend = [handle_extend]
+        src_timeranges: List[Timerange] = []
+        for index, material in enumerate(materials):
+            source_timerange = source_timeranges[index] if source_timeranges is not None else None
+            if source_timerange is None:
+                if isinstance(material, Video_material) and (material.material_type == "photo"):
+                    source_timerange = Timerange(0, track.get_segment(index).duration)
+                else:
+                    source_timerange = Timerange(0, material.duration)
+            src_timeranges.append(source_timerange)
+
+        try:
+            for index in track._iter_replace_segments(src_timeranges, [material.material_id for material in materials],
+                                                      handle_shrink, handle_extend):
+                self.add_material(materials[index])
+        finally:
+            self._mark_track_dirty(track)
+        return self
+
     def replace_text(self, track: Editable_track, segment_index: int, text: Union[str, List[str]],
                      recalc_style: bool = True) -> "Script_file":
         """替换指定文本轨道上指定片段的文字内容, 支持普通文本片段或文本模板片段
@@ -636,11 +866,12 @@ class Script_file:
             return new_styles
 
         replaced: bool = False
-        material_id: str = track.segments[segment_index]["material_id"]
+        material_id: str = track.peek_segment(segment_index)["material_id"]
         # 尝试在文本素材中替换
-        for mat in self.imported_materials["texts"]:
+        for mat_index, mat in enumerate(self.imported_materials["texts"]):
             if mat["id"] != material_id:
                 continue
+            mat = self._writable_imported_material("texts", mat_index)
 
             if isinstance(text, list):
                 if len(text) != 1:
@@ -669,9 +900,10 @@ class Script_file:
                 raise ValueError(f"文字模板'{template['name']}'只有{len(resources)}段文本, 但提供了{len(text)}段替换内容")
 
             for sub_material_id, new_text in zip(map(lambda x: x["text_material_id"], resources), text):
-                for mat in self.imported_materials["texts"]:
+                for mat_index, mat in enumerate(self.imported_materials["texts"]):
                     if mat["id"] != sub_material_id:
                         continue
+                    mat = self._writable_imported_material("texts", mat_index)
 
                     if isinstance(mat["content"], str):
                         mat["content"] = new_text
@@ -689,6 +921,55 @@ class Script_file:
 
         return self
 
+    def _all_tracks(self) -> List[Base_track]:
+        """新建的轨道及导入的轨道, 顺序与导出时一致"""
+        track_list: List[Base_track] = list(self.tracks.values())
+        track_list.extend(self.imported_tracks)
+        return track_list
+
+    def segments_at(self, time: Union[int, str], *, track_type: Optional[Track_type] = None) -> List[Timeline_item]:
+        """查询所有轨道(包括导入的轨道)中在给定时刻处于活动状态的片段
+
+        Args:
+            time (`int` or `str`): 查询的时刻, 单位为微秒, 若为字符串则会调用`tim()`函数进行解析
+            track_type (`Track_type`, optional): 仅查询指定类型的轨道, 默认查询全部轨道
+
+        Returns:
+            按起始时间排序的命中片段列表, 起始时间相同时按轨道顺序排序
+        """
+        time = tim(time)
+        return self._timeline_index.query(self._all_tracks(), time, time + 1, track_type)
+
+    def segments_in(self, timerange: Timerange, *, track_type: Optional[Track_type] = None) -> List[Timeline_item]:
+        """查询所有轨道(包括导入的轨道)中与给定时间范围有重叠的片段
+
+        Args:
+            timerange (`Timerange`): 查询的时间范围
+            track_type (`Track_type`, optional): 仅查询指定类型的轨道, 默认查询全部轨道
+
+        Returns:
+            按起始时间排序的命中片段列表, 起始时间相同时按轨道顺序排序
+        """
+        return self._timeline_index.query(self._all_tracks(), timerange.start, timerange.end, track_type)
+
+    def find_gaps(self, timerange: Optional[Timerange] = None, *, track_type: Optional[Track_type] = None) -> List[Timerange]:
+        """查询给定时间范围内没有被任何轨道的片段覆盖的时间段
+
+        Args:
+            timerange (`Timerange`, optional): 查询的时间范围, 默认为整个草稿
+            track_type (`Track_type`, optional): 仅考虑指定类型的轨道, 默认考虑全部轨道
+        """
+        if timerange is None:
+            timerange = Timerange(0, self.duration)
+        return self._timeline_index.find_gaps(self._all_tracks(), timerange.start, timerange.end, track_type)
+
+    def invalidate_timeline(self, track: Optional[Base_track] = None) -> None:
+        """在直接修改了片段的时间范围后, 使相应轨道的时间范围索引失效, 未指定轨道时使全部轨道的索引失效
+
+        通过本类的方法所做的修改会自动使索引失效, 无需调用此方法
+        """
+        self._timeline_index.invalidate(track)
+
     def inspect_material(self) -> None:
         """输出草稿中导入的贴纸、文本气泡以及花字素材的元数据"""
         print("贴纸素材:")
@@ -706,39 +987,125 @@ class Script_file:
             if effect["type"] == "text_effect":
                 print("\tResource id: %s '%s'" % (effect["resource_id"], effect.get("name", "")))
 
-    def dumps(self) -> str:
-        """将草稿文件内容导出为JSON字符串"""
-        self.content["fps"] = self.fps
-        self.content["duration"] = self.duration
-        self.content["canvas_config"] = {"width": self.width, "height": self.height, "ratio": "original"}
-        self.content["materials"] = self.materials.export_json()
+    def _export_content(self) -> Dict[str, Any]:
+        """整理并返回待导出的草稿文件内容, 不修改草稿对象本身"""
+        content = dict(self.content)
+        content["fps"] = self.fps
+        content["duration"] = self.duration
+        content["canvas_config"] = {"width": self.width, "height": self.height, "ratio": "original"}
 
         # 合并导入的素材
+        materials = self.materials.export_json()
         for material_type, material_list in self.imported_materials.items():
-            if material_type not in self.content["materials"]:
-                self.content["materials"][material_type] = material_list
+            if material_type not in materials:
+                materials[material_type] = material_list
             else:
-                self.content["materials"][material_type].extend(material_list)
+                materials[material_type] = materials[material_type] + material_list
+        content["materials"] = materials
 
         # 对轨道排序并导出
-        track_list: List[Base_track] = list(self.tracks.values())
-        track_list.extend(self.imported_tracks)
+        track_list = self._all_tracks()
         track_list.sort(key=lambda track: track.render_index)
-        self.content["tracks"] = [track.export_json() for track in track_list]
+        content["tracks"] = [track.export_json() for track in track_list]
+
+        return content
 
-        return json.dumps(self.content, ensure_ascii=False, indent=4)
+    def set_export_cache_size(self, max_chars: int) -> None:
+        """设置带缩进导出时的JSON片段缓存容量(字符数), 默认为0, 即不缓存
+
+        启用后, 重复导出时未发生变化的素材列表及轨道将复用上次带缩进编码的结果, 代价是在草稿对象中保留这些片段(总长不超过`max_chars`).
+        适合反复保存同一个大型草稿的场景; `fork`得到的草稿使用相同的容量, 但不继承已缓存的片段
+        """
+        self._export_cache.resize(max_chars)
 
-    def dump(self, file_path: str) -> None:
-        """将草稿文件内容写入文件"""
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(self.dumps())
+    def dumps(self, indent: Optional[int] = 4) -> str:
+        """将草稿文件内容导出为JSON字符串, 启用了片段缓存(`set_export_cache_size`)时未发生变化的部分将复用缓存的编码结果
+
+        Args:
+            indent (`int`, optional): 缩进空格数, 默认为4. 为None时输出紧凑格式.
+        """
+        return "".join(self._export_cache.iterencode(self._export_content(), indent))
+
+    def _iter_file_bytes(self, content: Dict[str, Any], indent: Optional[int]) -> Iterator[bytes]:
+        """逐段生成写入文件的字节, 换行符与文本模式写入时一致"""
+        for chunk in self._export_cache.iterencode(content, indent):
+            if os.linesep != "\n":
+                chunk = chunk.replace("\n", os.linesep)
+            yield chunk.encode("utf-8")
+
+    def _file_matches(self, file_path: str, size: int, digest: bytes) -> bool:
+        """判断磁盘上的文件内容是否与给定的大小及摘要一致"""
+        if not os.path.isfile(file_path):
+            return False
+        stat = os.stat(file_path)
+        if stat.st_size != size:
+            return False
+        # 文件自上次写入后未被修改时, 直接使用记录的摘要
+        if self._last_written is not None and \
+                self._last_written[:3] == (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size):
+            return self._last_written[3] == digest
+
+        hasher = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(block)
+        return hasher.digest() == digest
+
+    def dump(self, file_path: str, *, indent: Optional[int] = 4, skip_unchanged: bool = True) -> bool:
+        """将草稿文件内容以流式方式写入文件, 不在内存中构造完整的JSON字符串
+
+        内容先写入同目录下的临时文件(同时计算摘要)并同步到磁盘, 再原子地替换目标文件, 因此写入中途崩溃不会损坏原文件.
+        若内容与目标文件一致, 则删除临时文件而不替换. 缩进设置相同时, 写入的内容与`dumps()`的返回值完全一致
 
-    def save(self) -> None:
+        Args:
+            file_path (`str`): 写入的文件路径
+            indent (`int`, optional): 缩进空格数, 默认为4. 为None时输出紧凑格式.
+            skip_unchanged (`bool`, optional): 内容与磁盘上的文件完全一致时跳过写入, 默认为是.
+
+        Returns:
+            `bool`: 是否实际写入了文件
+        """
+        content = self._export_content()
+
+        hasher = hashlib.sha256()
+        size = 0
+        temp_path = "%s.%s.tmp" % (file_path, uuid.uuid4().hex)
+        try:
+            with open(temp_path, "xb") as f:
+                for data in self._iter_file_bytes(content, indent):
+                    hasher.update(data)
+                    size += len(data)
+                    f.write(data)
+                unchanged = skip_unchanged and self._file_matches(file_path, size, hasher.digest())
+                if not unchanged:
+                    f.flush()
+                    os.fsync(f.fileno())
+            if unchanged:
+                os.remove(temp_path)
+                return False
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        stat = os.stat(file_path)
+        self._last_written = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, hasher.digest())
+        return True
+
+    def save(self, *, indent: Optional[int] = 4, skip_unchanged: bool = True) -> bool:
         """保存草稿文件至打开时的路径, 仅在模板模式下可用
 
+        Args:
+            indent (`int`, optional): 缩进空格数, 默认为4. 为None时输出紧凑格式.
+            skip_unchanged (`bool`, optional): 内容与磁盘上的文件完全一致时跳过写入, 默认为是.
+
+        Returns:
+            `bool`: 是否实际写入了文件
+
         Raises:
             `ValueError`: 不在模板模式下
         """
         if self.save_path is None:
             raise ValueError("没有设置保存路径, 可能不在模板模式下")
-        self.dump(self.save_path)
+        return self.dump(self.save_path, indent=indent, skip_unchanged=skip_unchanged)
@@ -1,8 +1,9 @@
 """定义片段基类及部分比较通用的属性类"""
 
 import uuid
-from typing import Optional, Dict, List, Any, Union
+from typing import Optional, Dict, List, Tuple, Any, Union
 
+from . import util
 from .animation import Segment_animations
 from .time_util import Timerange, tim
 from .keyframe import Keyframe_list, Keyframe_property
@@ -10,6 +11,9 @@ from .keyframe import Keyframe_list, Keyframe_property
 class Base_segment:
     """片段基类"""
 
+    __slots__ = ("segment_id", "material_id", "target_timerange", "common_keyframes", "_json_cache")
+    __reduce_ex__ = util.slots_reduce_ex
+
     segment_id: str
     """片段全局id, 由程序自动生成"""
     material_id: str
@@ -20,12 +24,16 @@ class Base_segment:
     common_keyframes: List[Keyframe_list]
     """各属性的关键帧列表"""
 
+    _json_cache: Optional[Tuple[Tuple[Any, ...], Dict[str, Any]]]
+    """`export_json`结果的缓存: (导出时的属性签名, 导出结果)"""
+
     def __init__(self, material_id: str, target_timerange: Timerange):
         self.segment_id = uuid.uuid4().hex
         self.material_id = material_id
         self.target_timerange = target_timerange
 
         self.common_keyframes = []
+        self._json_cache = None
 
     @property
     def start(self) -> int:
@@ -52,6 +60,25 @@ class Base_segment:
         """判断是否与另一个片段有重叠"""
         return self.target_timerange.overlaps(other.target_timerange)
 
+    def _export_signature(self) -> Tuple[Any, ...]:
+        """`export_json`结果所依赖的全部可变属性值, 签名不变时可以复用上次的导出结果
+
+        子类若在`export_json`中导出了其它可变属性, 应一并覆盖此方法
+        """
+        keyframes = tuple([(kf_list.keyframe_property, tuple([(kf.time_offset, tuple(kf.values)) for kf in kf_list.keyframes]))
+                           for kf_list in self.common_keyframes])
+        return (self.segment_id, self.material_id, self.target_timerange.start, self.target_timerange.duration, keyframes)
+
+    def cached_export_json(self) -> Dict[str, Any]:
+        """带缓存的`export_json`, 片段未发生变化时直接返回上次的导出结果, 调用方不应修改返回值"""
+        signature = self._export_signature()
+        cache = self._json_cache
+        if cache is not None and cache[0] == signature:
+            return cache[1]
+        json_data = self.export_json()
+        self._json_cache = (signature, json_data)
+        return json_data
+
     def export_json(self) -> Dict[str, Any]:
         """返回通用于各种片段的属性"""
         return {
@@ -79,6 +106,9 @@ class Base_segment:
 class Speed:
     """播放速度对象, 目前只支持固定速度"""
 
+    __slots__ = ("global_id", "speed")
+    __reduce_ex__ = util.slots_reduce_ex
+
     global_id: str
     """全局id, 由程序自动生成"""
     speed: float
@@ -100,6 +130,9 @@ class Speed:
 class Clip_settings:
     """素材片段的图像调节设置"""
 
+    __slots__ = ("alpha", "flip_horizontal", "flip_vertical", "rotation", "scale_x", "scale_y", "transform_x", "transform_y")
+    __reduce_ex__ = util.slots_reduce_ex
+
     alpha: float
     """图像不透明度, 0-1"""
     flip_horizontal: bool
@@ -154,6 +187,8 @@ class Clip_settings:
 class Media_segment(Base_segment):
     """媒体片段基类"""
 
+    __slots__ = ("source_timerange", "speed", "volume", "extra_material_refs")
+
     source_timerange: Optional[Timerange]
     """截取的素材片段的时间范围, 对贴纸而言不存在"""
     speed: Speed
@@ -173,6 +208,13 @@ class Media_segment(Base_segment):
 
         self.extra_material_refs = [self.speed.global_id]
 
+    def _export_signature(self) -> Tuple[Any, ...]:
+        source = self.source_timerange
+        return super()._export_signature() + (
+            source.start if source else None, source.duration if source else None,
+            self.speed.speed, self.volume, len(self.extra_material_refs)
+        )
+
     def export_json(self) -> Dict[str, Any]:
         """返回通用于音频和视频片段的默认属性"""
         ret = super().export_json()
@@ -187,6 +229,8 @@ class Media_segment(Base_segment):
 class Visual_segment(Media_segment):
     """视觉片段基类，用于处理所有可见片段（视频、贴纸、文本）的共同属性和行为"""
 
+    __slots__ = ("clip_settings", "uniform_scale", "animations_instance")
+
     clip_settings: Clip_settings
     """图像调节设置, 其效果可被关键帧覆盖"""
 
@@ -246,6 +290,13 @@ class Visual_segment(Media_segment):
         self.common_keyframes.append(kf_list)
         return self
 
+    def _export_signature(self) -> Tuple[Any, ...]:
+        clip = self.clip_settings
+        return super()._export_signature() + (
+            clip.alpha, clip.flip_horizontal, clip.flip_vertical, clip.rotation,
+            clip.scale_x, clip.scale_y, clip.transform_x, clip.transform_y, self.uniform_scale
+        )
+
     def export_json(self) -> Dict[str, Any]:
         """导出通用于所有视觉片段的JSON数据"""
         json_dict = super().export_json()
@@ -1,7 +1,7 @@
 """与模板模式相关的类及函数等"""
 
 from enum import Enum
-from copy import deepcopy
+from copy import copy, deepcopy
 
 from . import util
 from . import exceptions
@@ -10,7 +10,7 @@ from .segment import Base_segment
 from .track import Base_track, Track_type
 from .local_materials import Video_material, Audio_material
 
-from typing import List, Dict, Any
+from typing import Optional, List, Dict, Sequence, Iterator, Any
 
 class Shrink_mode(Enum):
     """处理替换素材时素材变短情况的方法"""
@@ -44,38 +44,62 @@ class Imported_media_segment(Base_segment):
     """导入的视频/音频片段"""
 
     raw_data: Dict[str, Any]
-    """原始数据"""
+    """原始数据, 与解析出的模板共享, 不应被修改"""
 
     source_timerange: Timerange
     """片段取用的素材时间范围"""
 
     __DATA_ATTRS = ["material_id", "source_timerange", "target_timerange"]
     def __init__(self, json_data: Dict[str, Any]):
-        self.raw_data = deepcopy(json_data)
+        self.raw_data = json_data
 
         util.assign_attr_with_json(self, self.__DATA_ATTRS, json_data)
 
-    def export_json(self) -> Dict[str, Any]:
-        json_data = deepcopy(self.raw_data)
-        json_data.update(util.export_attr_to_json(self, self.__DATA_ATTRS))
-        
-        # --- 新增：确保 volume 和 last_nonzero_volume 被写入 JSON --- 
+    def fork(self) -> "Imported_media_segment":
+        """复制出一个独立的片段, 原始数据与本片段共享"""
+        new_segment = copy(self)
+        new_segment.source_timerange = Timerange(self.source_timerange.start, self.source_timerange.duration)
+        new_segment.target_timerange = Timerange(self.target_timerange.start, self.target_timerange.duration)
+        return new_segment
+
+    def _changed_fields(self) -> Dict[str, Any]:
+        """相对于原始数据发生了变化的字段及其导出值"""
+        changes: Dict[str, Any] = {}
+        if self.material_id != self.raw_data["material_id"]:
+            changes["material_id"] = self.material_id
+        for attr in ("source_timerange", "target_timerange"):
+            timerange: Timerange = getattr(self, attr)
+            raw_timerange = self.raw_data[attr]
+            if timerange.start != int(raw_timerange["start"]) or timerange.duration != int(raw_timerange["duration"]):
+                changes[attr] = timerange.export_json()
+
+        # 确保 volume 和 last_nonzero_volume 被写入 JSON
         if hasattr(self, 'volume'):
-            json_data['volume'] = self.volume
+            changes['volume'] = self.volume
             # 如果音量不为0，则同步更新 last_nonzero_volume
             if abs(self.volume) > 1e-6: # 避免浮点数精度问题
-                json_data['last_nonzero_volume'] = self.volume
+                changes['last_nonzero_volume'] = self.volume
             # 如果音量为0，则保持 last_nonzero_volume 不变 (或按需设置为上次的值)
             # 注意：当前实现下，若音量为0，last_nonzero_volume 会保留原始值
-        # ----------------------------------------------------------
-            
+        return changes
+
+    def export_json(self) -> Dict[str, Any]:
+        """导出片段数据, 仅在原始数据的浅拷贝上覆盖发生变化的字段
+
+        未变化的部分(包括整个片段未变化时的返回值本身)与原始数据共享, 不应修改
+        """
+        changes = self._changed_fields()
+        if not changes:
+            return self.raw_data
+        json_data = dict(self.raw_data)
+        json_data.update(changes)
         return json_data
 
 class Imported_track(Base_track):
     """模板模式下导入的轨道"""
 
     raw_data: Dict[str, Any]
-    """原始轨道数据"""
+    """原始轨道数据, 与解析出的模板共享, 不应被修改"""
 
     def __init__(self, json_data: Dict[str, Any]):
         self.track_type = Track_type.from_name(json_data["type"])
@@ -83,7 +107,11 @@ class Imported_track(Base_track):
         self.track_id = json_data["id"]
         self.render_index = max([int(seg["render_index"]) for seg in json_data["segments"]] + [0])
 
-        self.raw_data = deepcopy(json_data)
+        self.raw_data = json_data
+
+    def fork(self) -> "Imported_track":
+        """复制出一个独立的轨道, 原始数据与本轨道共享"""
+        return copy(self)
 
     def export_json(self) -> Dict[str, Any]:
         return self.raw_data
@@ -94,32 +122,189 @@ class Editable_track(Imported_track):
 class Imported_text_track(Editable_track):
     """模板模式下导入的文本轨道"""
 
-    segments: List[Dict[str, Any]]
-    """该轨道包含的片段列表"""
+    _segments: Optional[List[Dict[str, Any]]]
+    """片段列表, 在首次访问时才从原始数据中复制出来"""
 
     def __init__(self, json_data: Dict[str, Any]):
         super().__init__(json_data)
-        self.segments = deepcopy(json_data["segments"])
+        self._segments = None
+
+    @property
+    def segments(self) -> List[Dict[str, Any]]:
+        """该轨道包含的片段列表"""
+        if self._segments is None:
+            self._segments = deepcopy(self.raw_data["segments"])
+        return self._segments
+    @segments.setter
+    def segments(self, value: List[Dict[str, Any]]):
+        self._segments = value
 
     def __len__(self):
-        return len(self.segments)
+        if self._segments is None:
+            return len(self.raw_data["segments"])
+        return len(self._segments)
+
+    def peek_segment(self, index: int) -> Dict[str, Any]:
+        """读取指定下标片段的JSON数据而不复制片段列表, 尚未复制时返回与模板共享的原始数据, 不应被修改
+
+        Raises:
+            `IndexError`: 下标越界
+        """
+        if self._segments is None:
+            return self.raw_data["segments"][index]
+        return self._segments[index]
+
+    def fork(self) -> "Imported_text_track":
+        new_track = copy(self)
+        if self._segments is not None:
+            new_track._segments = deepcopy(self._segments)
+        return new_track
 
     def export_json(self) -> Dict[str, Any]:
-        self.raw_data.update({"segments": deepcopy(self.segments)})
-        return self.raw_data
+        if self._segments is None:
+            return self.raw_data
+        json_data = dict(self.raw_data)
+        json_data["segments"] = self._segments
+        return json_data
+
+class Pending_shifts:
+    """记录一系列片段尚未应用的起始时间偏移量, 支持O(log n)地后移某个下标之后的全部片段
+
+    内部使用树状数组(Fenwick tree)维护偏移量的差分数组, 同时保留差分数组本身以便一次性应用全部偏移
+    """
+
+    size: int
+    """片段数量"""
+    pending: bool
+    """是否存在未应用的偏移"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.pending = False
+        self._tree = [0] * (size + 1)
+        self._diff = [0] * (size + 1)
+
+    def copy(self) -> "Pending_shifts":
+        new_shifts = copy(self)
+        new_shifts._tree = list(self._tree)
+        new_shifts._diff = list(self._diff)
+        return new_shifts
+
+    def shift_from(self, index: int, delta: int) -> None:
+        """将下标不小于`index`的所有片段的起始时间偏移`delta`"""
+        if delta == 0 or index >= self.size:
+            return
+        self.pending = True
+        self._diff[index] += delta
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def query(self, index: int) -> int:
+        """获取下标为`index`的片段尚未应用的偏移量"""
+        total = 0
+        i = index + 1
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def take(self, index: int) -> int:
+        """取出并清除下标为`index`的片段尚未应用的偏移量, 不影响其他片段"""
+        delta = self.query(index)
+        if delta != 0:
+            self.shift_from(index, -delta)
+            self.shift_from(index + 1, delta)
+        return delta
+
+    def take_all(self) -> List[int]:
+        """取出并清除所有片段尚未应用的偏移量"""
+        deltas: List[int] = []
+        total = 0
+        for i in range(self.size):
+            total += self._diff[i]
+            deltas.append(total)
+        self._tree = [0] * (self.size + 1)
+        self._diff = [0] * (self.size + 1)
+        self.pending = False
+        return deltas
 
 class Imported_media_track(Editable_track):
     """模板模式下导入的音频/视频轨道"""
 
-    segments: List[Imported_media_segment]
-    """该轨道包含的片段列表"""
+    _segments: Optional[List[Imported_media_segment]]
+    """片段列表, 在首次访问时才根据原始数据构造"""
+    _shifts: Optional[Pending_shifts]
+    """替换素材时产生的尚未应用到片段上的起始时间偏移, 在访问整个片段列表或导出时统一应用"""
 
     def __init__(self, json_data: Dict[str, Any]):
         super().__init__(json_data)
-        self.segments = [Imported_media_segment(seg) for seg in json_data["segments"]]
+        self._segments = None
+        self._shifts = None
+
+    @property
+    def segments(self) -> List[Imported_media_segment]:
+        """该轨道包含的片段列表"""
+        segments = self._ensure_segments()
+        self._apply_shifts()
+        return segments
+    @segments.setter
+    def segments(self, value: List[Imported_media_segment]):
+        self._segments = value
+        self._shifts = None
+
+    def _ensure_segments(self) -> List[Imported_media_segment]:
+        if self._segments is None:
+            self._segments = [Imported_media_segment(seg) for seg in self.raw_data["segments"]]
+        return self._segments
+
+    def _apply_shifts(self) -> None:
+        """将尚未应用的起始时间偏移写入各片段"""
+        if self._shifts is None or not self._shifts.pending:
+            return
+        for seg, delta in zip(self._ensure_segments(), self._shifts.take_all()):
+            if delta != 0:
+                seg.start += delta
+
+    def get_segment(self, index: int) -> Imported_media_segment:
+        """获取指定下标的片段, 只会应用此片段自身尚未应用的偏移, 适合在逐个替换素材时使用
+
+        Raises:
+            `IndexError`: 下标越界
+        """
+        segments = self._ensure_segments()
+        seg = segments[index]
+        if self._shifts is not None and self._shifts.pending:
+            if index < 0:
+                index += len(segments)
+            delta = self._shifts.take(index)
+            if delta != 0:
+                seg.start += delta
+        return seg
+
+    def _shift_segments_from(self, index: int, delta: int) -> None:
+        """将下标不小于`index`的所有片段的起始时间偏移`delta`, 偏移延迟到需要时再应用"""
+        if delta == 0:
+            return
+        segments = self._ensure_segments()
+        if self._shifts is None or self._shifts.size != len(segments):
+            self._apply_shifts()
+            self._shifts = Pending_shifts(len(segments))
+        self._shifts.shift_from(index, delta)
 
     def __len__(self):
-        return len(self.segments)
+        if self._segments is None:
+            return len(self.raw_data["segments"])
+        return len(self._segments)
+
+    def fork(self) -> "Imported_media_track":
+        new_track = copy(self)
+        if self._segments is not None:
+            new_track._segments = [seg.fork() for seg in self._segments]
+        if self._shifts is not None:
+            new_track._shifts = self._shifts.copy()
+        return new_track
 
     @property
     def start_time(self) -> int:
@@ -146,8 +331,49 @@ class Imported_media_track(Editable_track):
     def process_timerange(self, seg_index: int, src_timerange: Timerange,
                           shrink: Shrink_mode, extend: List[Extend_mode]) -> None:
         """处理素材替换的时间范围变更"""
-        seg = self.segments[seg_index]
+        seg = self.get_segment(seg_index)
+        prev_seg_end = int(0) if seg_index == 0 else self.get_segment(seg_index-1).target_timerange.end
+        next_seg_start = int(1e15) if seg_index == len(self)-1 else self.get_segment(seg_index+1).start
+
+        shift = self._resize_segment(seg, src_timerange, prev_seg_end, next_seg_start, shrink, extend)
+        self._shift_segments_from(seg_index+1, shift)
+
+    def _iter_replace_segments(self, src_timeranges: Sequence[Timerange], material_ids: Sequence[str],
+                               shrink: Shrink_mode, extend: List[Extend_mode]) -> Iterator[int]:
+        """从第一个片段起依次处理时间范围变更并替换素材id, 每替换完一个片段即产出其下标
+
+        后续片段的整体偏移在遍历过程中累积, 每个片段只被访问一次, 结果与逐个调用`process_timerange`一致.
+        即使中途出错或停止迭代, 已累积的偏移也会被正确记录
+        """
+        segments = self.segments
+        offset = 0
+        first_unshifted = 0
+        try:
+            for index, (src_timerange, material_id) in enumerate(zip(src_timeranges, material_ids)):
+                seg = segments[index]
+                seg.start += offset
+                first_unshifted = index + 1
+
+                prev_seg_end = int(0) if index == 0 else segments[index-1].target_timerange.end
+                next_seg_start = int(1e15) if index == len(segments)-1 else segments[index+1].start + offset
+                offset += self._resize_segment(seg, src_timerange, prev_seg_end, next_seg_start, shrink, extend)
+
+                seg.material_id = material_id
+                yield index
+        finally:
+            self._shift_segments_from(first_unshifted, offset)
+
+    @staticmethod
+    def _resize_segment(seg: Imported_media_segment, src_timerange: Timerange, prev_seg_end: int, next_seg_start: int,
+                        shrink: Shrink_mode, extend: List[Extend_mode]) -> int:
+        """根据新素材的时间范围调整片段, 返回后续片段需要整体偏移的量
+
+        Args:
+            prev_seg_end (`int`): 前一片段的结束时间, 没有前一片段时为0
+            next_seg_start (`int`): 后一片段的开始时间, 没有后一片段时为一个足够大的数
+        """
         new_duration = src_timerange.duration
+        shift = 0
 
         # 时长变短
         delta_duration = abs(new_duration - seg.duration)
@@ -158,8 +384,7 @@ class Imported_media_track(Editable_track):
                 seg.duration -= delta_duration
             elif shrink == Shrink_mode.cut_tail_align:
                 seg.duration -= delta_duration
-                for i in range(seg_index+1, len(self.segments)):  # 后续片段也依次前移相应值（保持间隙）
-                    self.segments[i].start -= delta_duration
+                shift = -delta_duration  # 后续片段也依次前移相应值（保持间隙）
             elif shrink == Shrink_mode.shrink:
                 seg.duration -= delta_duration
                 seg.start += delta_duration // 2
@@ -168,8 +393,6 @@ class Imported_media_track(Editable_track):
         # 时长变长
         elif new_duration > seg.duration:
             success_flag = False
-            prev_seg_end = int(0) if seg_index == 0 else self.segments[seg_index-1].target_timerange.end
-            next_seg_start = int(1e15) if seg_index == len(self.segments)-1 else self.segments[seg_index+1].start
             for mode in extend:
                 if mode == Extend_mode.extend_head:
                     if seg.start - delta_duration >= prev_seg_end:
@@ -180,11 +403,8 @@ class Imported_media_track(Editable_track):
                         seg.duration += delta_duration
                         success_flag = True
                 elif mode == Extend_mode.push_tail:
-                    shift_duration = max(0, seg.target_timerange.end + delta_duration - next_seg_start)
+                    shift = max(0, seg.target_timerange.end + delta_duration - next_seg_start)  # 有必要时后移后续片段
                     seg.duration += delta_duration
-                    if shift_duration > 0:  # 有必要时后移后续片段
-                        for i in range(seg_index+1, len(self.segments)):
-                            self.segments[i].start += shift_duration
                     success_flag = True
                 elif mode == Extend_mode.cut_material_tail:
                     src_timerange.duration = seg.duration
@@ -199,10 +419,15 @@ class Imported_media_track(Editable_track):
 
         # 写入素材时间范围
         seg.source_timerange = src_timerange
+        return shift
 
     def export_json(self) -> Dict[str, Any]:
-        self.raw_data.update({"segments": [seg.export_json() for seg in self.segments]})
-        return self.raw_data
+        if self._segments is None:
+            return self.raw_data
+        self._apply_shifts()
+        json_data = dict(self.raw_data)
+        json_data["segments"] = [seg.export_json() for seg in self._segments]
+        return json_data
 
 def import_track(json_data: Dict[str, Any]) -> Imported_track:
     """导入轨道"""
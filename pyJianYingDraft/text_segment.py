@@ -14,6 +14,9 @@ from .animation import Segment_animations, Text_animation
 from .metadata import Font_type, Effect_meta
 from .metadata import Text_intro, Text_outro, Text_loop_anim
 
+_content_encoder = json.JSONEncoder(ensure_ascii=False)
+"""编码文本素材`content`字段使用的编码器, 复用以免每次调用`json.dumps`时都重新构造"""
+
 class Text_style:
     """字体样式类"""
 
@@ -201,6 +204,8 @@ class TextEffect(TextBubble):
 class Text_segment(Visual_segment):
     """文本片段类, 目前仅支持设置基本的字体样式"""
 
+    __slots__ = ("text", "font", "style", "border", "background", "bubble", "effect")
+
     text: str
     """文本内容"""
     font: Optional[Effect_meta]
@@ -364,7 +369,7 @@ class Text_segment(Visual_segment):
 
         ret = {
             "id": self.material_id,
-            "content": json.dumps(content_json, ensure_ascii=False),
+            "content": _content_encoder.encode(content_json),
 
             "typesetting": int(self.style.vertical),
             "alignment": self.style.align,
@@ -1,5 +1,7 @@
 """定义时间范围类以及与时间相关的辅助函数"""
 
+from . import util
+
 from typing import Union
 from typing import Dict
 
@@ -33,6 +35,9 @@ def tim(inp: Union[str, float]) -> int:
 
 class Timerange:
     """记录了起始时间及持续长度的时间范围"""
+
+    __slots__ = ("start", "duration")
+    __reduce_ex__ = util.slots_reduce_ex
     start: int
     """起始时间, 单位为微秒"""
     duration: int
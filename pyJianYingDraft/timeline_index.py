@@ -0,0 +1,167 @@
+"""跨轨道的时间范围查询索引
+
+每条轨道按片段起始时间建立有序边界索引, 同时记录结束时间的前缀最大值,
+因此即使轨道内片段有重叠也能正确查询; 片段不重叠时单条轨道的查询复杂度为O(log n + k)
+"""
+
+import bisect
+
+from typing import Optional, Union, NamedTuple
+from typing import Dict, List, Tuple, Iterable, Any
+
+from .time_util import Timerange
+from .track import Track_type, Base_track, Track
+from .template_mode import Imported_track, Imported_media_track, Imported_text_track
+
+class Timeline_item(NamedTuple):
+    """时间范围查询命中的一个片段"""
+
+    track: Base_track
+    """片段所在的轨道"""
+    index: int
+    """片段在轨道片段列表中的下标"""
+    start: int
+    """片段在轨道上的起始时间, 微秒"""
+    end: int
+    """片段在轨道上的结束时间, 微秒"""
+
+    @property
+    def timerange(self) -> Timerange:
+        """片段在轨道上的时间范围"""
+        return Timerange(self.start, self.end - self.start)
+
+    @property
+    def segment(self) -> Union[Any, Dict[str, Any]]:
+        """片段本身
+
+        新建轨道及导入的音视频轨道返回片段对象, 导入的文本轨道及其它导入轨道返回片段的JSON数据,
+        其中尚未被修改的部分与模板共享, 不应被修改
+        """
+        track = self.track
+        if isinstance(track, Imported_media_track):
+            return track.get_segment(self.index)
+        if isinstance(track, Imported_text_track):
+            return track.peek_segment(self.index)
+        if isinstance(track, Track):
+            return track.segments[self.index]
+        assert isinstance(track, Imported_track)
+        return track.raw_data["segments"][self.index]
+
+class Track_interval_index:
+    """单条轨道的有序边界索引"""
+
+    starts: List[int]
+    """按起始时间排序后各片段的起始时间"""
+    ends: List[int]
+    """与`starts`一一对应的结束时间"""
+    max_ends: List[int]
+    """`ends`的前缀最大值, 单调不减"""
+    indices: List[int]
+    """与`starts`一一对应的片段下标"""
+
+    def __init__(self, timeranges: Iterable[Tuple[int, int]]):
+        """根据各片段的(起始时间, 结束时间)建立索引, 顺序即为片段下标"""
+        entries = sorted((start, end, i) for i, (start, end) in enumerate(timeranges))
+        self.starts = [entry[0] for entry in entries]
+        self.ends = [entry[1] for entry in entries]
+        self.indices = [entry[2] for entry in entries]
+
+        self.max_ends = []
+        max_end = -1
+        for end in self.ends:
+            max_end = max(max_end, end)
+            self.max_ends.append(max_end)
+
+    def query(self, start: int, end: int) -> List[int]:
+        """返回与[start, end)有重叠的所有条目在索引中的位置, 按起始时间排序"""
+        hi = bisect.bisect_left(self.starts, end)
+        lo = bisect.bisect_right(self.max_ends, start, 0, hi)
+        ends = self.ends
+        return [pos for pos in range(lo, hi) if ends[pos] > start]
+
+def _track_timeranges(track: Base_track) -> List[Tuple[int, int]]:
+    """按片段下标顺序获取轨道中各片段的(起始时间, 结束时间)"""
+    if isinstance(track, (Track, Imported_media_track)):
+        return [(seg.target_timerange.start, seg.target_timerange.end) for seg in track.segments]
+
+    if isinstance(track, Imported_text_track):
+        segments = track.segments if track._segments is not None else track.raw_data["segments"]
+    elif isinstance(track, Imported_track):
+        segments = track.raw_data["segments"]
+    else:
+        raise TypeError("不支持的轨道类型 %s" % type(track))
+    ret: List[Tuple[int, int]] = []
+    for seg in segments:
+        start = int(seg["target_timerange"]["start"])
+        ret.append((start, start + int(seg["target_timerange"]["duration"])))
+    return ret
+
+def _track_signature(track: Base_track) -> Tuple[Any, ...]:
+    """轨道片段列表的标识, 列表被替换或长度变化时索引即失效"""
+    if isinstance(track, Track):
+        segments = track.segments
+    elif isinstance(track, (Imported_media_track, Imported_text_track)):
+        segments = track._segments
+        if segments is None:  # 尚未从原始数据复制出片段列表
+            segments = track.raw_data["segments"]
+    elif isinstance(track, Imported_track):
+        segments = track.raw_data["segments"]
+    else:
+        raise TypeError("不支持的轨道类型 %s" % type(track))
+    return (id(segments), len(segments))
+
+class Timeline_index:
+    """草稿中所有轨道的时间范围索引, 各轨道的索引在首次查询时建立
+
+    通过`Script_file`的方法修改轨道时索引会自动失效; 直接修改片段的时间范围后需调用`invalidate`
+    """
+
+    _tracks: Dict[int, Tuple[Base_track, Tuple[Any, ...], Track_interval_index]]
+    """轨道对象id -> (轨道, 建立索引时的轨道标识, 轨道索引)"""
+
+    def __init__(self):
+        self._tracks = {}
+
+    def invalidate(self, track: Optional[Base_track] = None) -> None:
+        """使指定轨道的索引失效, 未指定时使全部索引失效"""
+        if track is None:
+            self._tracks.clear()
+        else:
+            self._tracks.pop(id(track), None)
+
+    def _get_track_index(self, track: Base_track) -> Track_interval_index:
+        signature = _track_signature(track)
+        entry = self._tracks.get(id(track))
+        if entry is not None and entry[0] is track and entry[1] == signature:
+            return entry[2]
+
+        index = Track_interval_index(_track_timeranges(track))
+        self._tracks[id(track)] = (track, signature, index)
+        return index
+
+    def query(self, tracks: Iterable[Base_track], start: int, end: int,
+              track_type: Optional[Track_type] = None) -> List[Timeline_item]:
+        """查询给定轨道中与[start, end)有重叠的片段, 结果按起始时间排序, 起始时间相同时按轨道顺序排序"""
+        hits: List[Tuple[int, int, Timeline_item]] = []
+        for order, track in enumerate(tracks):
+            if track_type is not None and track.track_type != track_type:
+                continue
+            index = self._get_track_index(track)
+            for pos in index.query(start, end):
+                hits.append((index.starts[pos], order,
+                             Timeline_item(track, index.indices[pos], index.starts[pos], index.ends[pos])))
+        hits.sort(key=lambda hit: hit[:2])
+        return [hit[2] for hit in hits]
+
+    def find_gaps(self, tracks: Iterable[Base_track], start: int, end: int,
+                  track_type: Optional[Track_type] = None) -> List[Timerange]:
+        """查询[start, end)中没有被给定轨道的任何片段覆盖的时间段, 按时间顺序排列"""
+        gaps: List[Timerange] = []
+        cursor = start
+        for item in self.query(tracks, start, end, track_type):
+            if item.start > cursor:
+                gaps.append(Timerange(cursor, item.start - cursor))
+            cursor = max(cursor, item.end)
+        if cursor < end:
+            gaps.append(Timerange(cursor, end - cursor))
+        return gaps
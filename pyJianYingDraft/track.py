@@ -1,10 +1,11 @@
 """轨道类及其元数据"""
 
 import uuid
+import bisect
 
 from enum import Enum
-from typing import TypeVar, Generic, Type
-from typing import Dict, List, Any, Union
+from typing import TypeVar, Generic, Type, Optional
+from typing import Dict, List, Tuple, Sequence, Any, Union
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
@@ -76,7 +77,18 @@ class Track(Base_track, Generic[Seg_type]):
     """是否静音"""
 
     segments: List[Seg_type]
-    """该轨道包含的片段列表"""
+    """该轨道包含的片段列表, 按添加顺序排列"""
+
+    _sorted_keys: List[Tuple[int, int]]
+    """按开始时间排序的各片段(开始时间, 结束时间), 用于二分查找重叠片段"""
+    _sorted_segments: List[Seg_type]
+    """与`_sorted_keys`一一对应的片段"""
+    _indexed_list: Optional[List[Seg_type]]
+    """建立排序索引时的`segments`列表对象"""
+    _indexed_count: int
+    """`segments`中已加入排序索引的片段数"""
+    _indexed_last: Optional[Seg_type]
+    """最后一个已加入排序索引的片段, 用于检测`segments`是否被修改"""
 
     def __init__(self, track_type: Track_type, name: str, render_index: int, mute: bool):
         self.track_type = track_type
@@ -87,6 +99,12 @@ class Track(Base_track, Generic[Seg_type]):
         self.mute = mute
         self.segments = []
 
+        self._sorted_keys = []
+        self._sorted_segments = []
+        self._indexed_list = None
+        self._indexed_count = 0
+        self._indexed_last = None
+
     @property
     def end_time(self) -> int:
         """轨道结束时间, 微秒"""
@@ -113,19 +131,116 @@ class Track(Base_track, Generic[Seg_type]):
             raise TypeError("New segment (%s) is not of the same type as the track (%s)" % (type(segment), self.accept_segment_type))
 
         # 检查片段是否重叠
-        for seg in self.segments:
-            if seg.overlaps(segment):
+        if self._find_overlap(segment) is not None:
+            raise SegmentOverlap("New segment overlaps with existing segment [start: {}, end: {}]"
+                                 .format(segment.target_timerange.start, segment.target_timerange.end))
+
+        self.segments.append(segment)
+        self._insert_sorted(segment)
+        self._indexed_count += 1
+        self._indexed_last = segment
+        return self
+
+    def add_segments(self, segments: Sequence[Seg_type]) -> "Track[Seg_type]":
+        """向轨道中批量添加片段, 要求与`add_segment`相同. 若有任何片段不满足要求, 则不会添加任何片段
+
+        新片段与已有片段一起排序后, 只需检查排序后相邻的片段是否重叠即可完成全部检查
+
+        Args:
+            segments (Sequence[Seg_type]): 要添加的片段, 在轨道中的顺序与传入顺序一致
+
+        Raises:
+            `TypeError`: 新片段类型与轨道类型不匹配
+            `SegmentOverlap`: 新片段与现有片段或其他新片段重叠
+        """
+        for segment in segments:
+            if not isinstance(segment, self.accept_segment_type):
+                raise TypeError("New segment (%s) is not of the same type as the track (%s)" % (type(segment), self.accept_segment_type))
+
+        # 按(开始时间, 结束时间, 序号)排序, 序号不小于`existing_count`的为新片段
+        existing_count = len(self.segments)
+        all_segments: List[Seg_type] = self.segments + list(segments)
+        order = sorted(range(len(all_segments)), key=lambda i: self._segment_key(all_segments[i]) + (i,))
+
+        for prev, cur in zip(order, order[1:]):
+            if prev < existing_count and cur < existing_count:
+                continue
+            if all_segments[prev].overlaps(all_segments[cur]):
+                segment = all_segments[max(prev, cur)]
                 raise SegmentOverlap("New segment overlaps with existing segment [start: {}, end: {}]"
                                      .format(segment.target_timerange.start, segment.target_timerange.end))
 
-        self.segments.append(segment)
+        self.segments.extend(segments)
+        self._set_sorted_index([all_segments[i] for i in order])
         return self
 
+    @staticmethod
+    def _segment_key(segment: Base_segment) -> Tuple[int, int]:
+        return (segment.target_timerange.start, segment.target_timerange.end)
+
+    def _insert_sorted(self, segment: Seg_type) -> None:
+        key = self._segment_key(segment)
+        pos = bisect.bisect_right(self._sorted_keys, key)
+        self._sorted_keys.insert(pos, key)
+        self._sorted_segments.insert(pos, segment)
+
+    def _rebuild_sorted_index(self) -> None:
+        """根据`segments`重建排序索引"""
+        self._set_sorted_index(sorted(self.segments, key=self._segment_key))
+
+    def _set_sorted_index(self, sorted_segments: List[Seg_type]) -> None:
+        """以排好序的`segments`中的全部片段作为排序索引"""
+        self._sorted_segments = sorted_segments
+        self._sorted_keys = [self._segment_key(seg) for seg in sorted_segments]
+        self._indexed_list = self.segments
+        self._indexed_count = len(self.segments)
+        self._indexed_last = self.segments[-1] if self.segments else None
+
+    def _sync_sorted_index(self) -> None:
+        """使排序索引与`segments`保持一致
+
+        直接向`segments`追加的片段会被增量加入索引; 若列表被整体替换或已索引的部分发生变化(如移除了片段), 则重建索引
+        """
+        count = self._indexed_count
+        if self._indexed_list is not self.segments or count > len(self.segments) or \
+                (count > 0 and self.segments[count - 1] is not self._indexed_last):
+            self._rebuild_sorted_index()
+            return
+        if count < len(self.segments):
+            for seg in self.segments[count:]:
+                self._insert_sorted(seg)
+            self._indexed_count = len(self.segments)
+            self._indexed_last = self.segments[-1]
+
+    def _find_overlap(self, segment: Base_segment) -> Optional[Seg_type]:
+        """查找与给定片段重叠的已有片段, 不存在时返回None
+
+        由于已有片段互不重叠, 按(开始时间, 结束时间)排序后其结束时间也是单调不减的,
+        故只需检查新片段在排序位置前后相邻的两个片段
+        """
+        self._sync_sorted_index()
+        key = self._segment_key(segment)
+        pos = bisect.bisect_left(self._sorted_keys, key)
+        neighbors = range(max(pos - 1, 0), min(pos + 1, len(self._sorted_segments)))
+
+        # 片段加入轨道后其时间范围可能被直接修改, 此时重建索引后再检查
+        if any(self._segment_key(self._sorted_segments[i]) != self._sorted_keys[i] for i in neighbors):
+            self._rebuild_sorted_index()
+            pos = bisect.bisect_left(self._sorted_keys, key)
+            neighbors = range(max(pos - 1, 0), min(pos + 1, len(self._sorted_segments)))
+
+        for i in neighbors:
+            if self._sorted_segments[i].overlaps(segment):
+                return self._sorted_segments[i]
+        return None
+
     def export_json(self) -> Dict[str, Any]:
-        # 为每个片段写入render_index
-        segment_exports = [seg.export_json() for seg in self.segments]
-        for seg in segment_exports:
-            seg["render_index"] = self.render_index
+        # 未发生变化的片段直接复用缓存的导出结果, 在其浅拷贝上写入render_index以免修改缓存
+        segment_exports: List[Dict[str, Any]] = []
+        for seg in self.segments:
+            seg_json = dict(seg.cached_export_json())
+            seg_json["render_index"] = self.render_index
+            segment_exports.append(seg_json)
 
         return {
             "attribute": int(self.mute),
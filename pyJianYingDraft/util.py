@@ -56,3 +56,24 @@ def export_attr_to_json(obj: object, attrs: List[str]) -> Dict[str, JsonExportab
         else:
             json_data[attr] = getattr(obj, attr)
     return json_data
+
+def slots_reduce_ex(obj: object, protocol: int) -> Any:
+    """供定义了`__slots__`的类用作`__reduce_ex__`, 使其也支持pickle协议0及1
+
+    协议2及以上(包括`copy`模块使用的协议)仍使用默认实现
+    """
+    if protocol >= 2:
+        return object.__reduce_ex__(obj, protocol)
+    state: Dict[str, Any] = dict(getattr(obj, "__dict__", {}))
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get("__slots__", ()):
+            if hasattr(obj, name):
+                state[name] = getattr(obj, name)
+    return (restore_slots_object, (type(obj), state))
+
+def restore_slots_object(cls: Type, state: Dict[str, Any]) -> Any:
+    """根据`slots_reduce_ex`保存的状态重建对象"""
+    obj = cls.__new__(cls)
+    for name, value in state.items():
+        object.__setattr__(obj, name, value)
+    return obj
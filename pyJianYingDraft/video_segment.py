@@ -246,6 +246,8 @@ class Transition:
 class Video_segment(Visual_segment):
     """安放在轨道上的一个视频/图片片段"""
 
+    __slots__ = ("material_instance", "material_size", "effects", "filters", "mask", "transition")
+
     material_instance: Video_material
     """素材实例"""
     material_size: Tuple[int, int]
@@ -438,6 +440,8 @@ class Video_segment(Visual_segment):
 class Sticker_segment(Visual_segment):
     """安放在轨道上的一个贴纸片段"""
 
+    __slots__ = ("resource_id",)
+
     resource_id: str
     """贴纸资源id"""
 
@@ -0,0 +1,141 @@
+"""音频波形(峰值包络)的预计算
+
+通过ffmpeg将音频解码为单声道浮点采样, 再用NumPy按时间分桶求取各桶的峰值, 结果以文件内容指纹为键缓存.
+此功能需要NumPy及ffmpeg, 默认不启用; 通过`set_waveform_resolution`启用后, `Audio_material`导出时会填写`wave_points`,
+剪映打开草稿时便不必再自行计算波形.
+"""
+
+import logging
+import subprocess
+
+from typing import Optional, List, Tuple, TYPE_CHECKING
+
+from .media_probe import Probe_cache, file_fingerprint, get_probe_cache, _Lru_memo, MEMO_SIZE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+if TYPE_CHECKING:
+    import numpy
+
+logger = logging.getLogger(__name__)
+
+FFMPEG = "ffmpeg"
+"""ffmpeg可执行文件的路径, 默认从PATH中查找"""
+
+DECODE_SAMPLE_RATE = 8000
+"""解码音频时使用的采样率, 只用于计算峰值, 无需使用原始采样率"""
+
+_resolution: Optional[int] = None
+
+def set_waveform_resolution(points_per_second: Optional[int]) -> Optional[int]:
+    """设置导出音频素材时`wave_points`的分辨率(每秒的波形点数), 传入None以禁用, 返回此前的设置
+
+    计算结果总会缓存在进程内; 只有通过`set_probe_cache`设置了全局持久化缓存时才会写入磁盘, 供之后的进程复用.
+    某个文件无法解码(如未找到ffmpeg)时仅记录日志并导出空的`wave_points`, 由剪映自行计算其波形
+
+    Raises:
+        `ValueError`: 分辨率不是正整数或超过解码采样率
+        `ImportError`: 未安装NumPy
+    """
+    global _resolution
+    if points_per_second is not None:
+        if not 0 < points_per_second <= DECODE_SAMPLE_RATE:
+            raise ValueError(f"波形分辨率应在1~{DECODE_SAMPLE_RATE}之间, 而不是{points_per_second}")
+        _require_numpy()
+    previous, _resolution = _resolution, points_per_second
+    return previous
+
+def get_waveform_resolution() -> Optional[int]:
+    """获取当前设置的波形分辨率, 未启用时返回None"""
+    return _resolution
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("计算音频波形需要安装NumPy")
+
+def decode_audio(path: str, sample_rate: int = DECODE_SAMPLE_RATE) -> "numpy.ndarray":
+    """使用ffmpeg将文件中的音频解码为单声道的float32采样数组, 取值范围约为[-1, 1]
+
+    Raises:
+        `ValueError`: 未找到ffmpeg或解码失败
+    """
+    _require_numpy()
+    command = [FFMPEG, "-v", "error", "-nostdin", "-i", path, "-vn", "-sn", "-dn",
+               "-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-"]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    except FileNotFoundError:
+        raise ValueError(f"无法解码音频文件 {path}, 未找到ffmpeg")
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"无法解码音频文件 {path}: {e.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def compute_peaks(samples: "numpy.ndarray", sample_rate: int, points_per_second: int) -> "numpy.ndarray":
+    """计算采样的峰值包络, 每个点为对应时间段内采样绝对值的最大值, 并以全局峰值归一化到[0, 1]
+
+    Returns:
+        float32数组, 长度为时长(秒)乘以`points_per_second`向上取整
+    """
+    _require_numpy()
+    if len(samples) == 0:
+        return np.zeros(0, dtype=np.float32)
+    count = min(-(-len(samples) * points_per_second // sample_rate), len(samples))
+    edges = np.arange(count, dtype=np.int64) * len(samples) // count
+    peaks = np.maximum.reduceat(np.abs(samples), edges)
+    top = peaks.max()
+    if top > 0:
+        peaks /= top
+    return peaks.astype(np.float32, copy=False)
+
+_memo: _Lru_memo[Tuple[str, int], "numpy.ndarray"] = _Lru_memo(MEMO_SIZE)
+
+def audio_waveform(path: str, points_per_second: int, cache: Optional[Probe_cache] = None) -> "numpy.ndarray":
+    """获取文件中音频的归一化峰值包络
+
+    结果在进程内及持久化缓存(未指定`cache`且未设置全局缓存时不使用)中以文件内容指纹和分辨率为键缓存, 因此内容相同的文件只会解码一次.
+    启用持久化缓存之前已算出的结果也会在下次获取时写入持久化缓存.
+
+    Args:
+        path (`str`): 音频或视频文件路径
+        points_per_second (`int`): 每秒的波形点数
+        cache (`Probe_cache`, optional): 使用的持久化缓存, 默认使用`set_probe_cache`设置的全局缓存
+
+    Raises:
+        `ImportError`: 未安装NumPy
+        `ValueError`: 未找到ffmpeg或解码失败
+    """
+    _require_numpy()
+    if cache is None:
+        cache = get_probe_cache()
+    key = (file_fingerprint(path, cache), points_per_second)
+    peaks = _memo.get(key)
+    if peaks is not None:
+        if cache is not None and not cache._is_stored("waveform", key):
+            cache._put_waveform(*key, peaks.tobytes())
+        return peaks
+
+    data = cache._get_waveform(*key) if cache is not None else None
+    if data is not None:
+        peaks = np.frombuffer(data, dtype=np.float32)
+    else:
+        peaks = compute_peaks(decode_audio(path), DECODE_SAMPLE_RATE, points_per_second)
+        peaks.flags.writeable = False
+        if cache is not None:
+            cache._put_waveform(*key, peaks.tobytes())
+
+    _memo.put(key, peaks)
+    return peaks
+
+def wave_points(path: str) -> List[float]:
+    """按当前设置的分辨率获取导出用的波形点, 未启用或解码失败时返回空列表"""
+    if _resolution is None:
+        return []
+    try:
+        peaks = audio_waveform(path, _resolution)
+    except (OSError, ValueError) as e:
+        logger.warning("计算音频波形失败, 将由剪映自行计算: %s", e)
+        return []
+    return np.round(peaks.astype(np.float64), 4).tolist()